@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
-from dbfread import DBF
 import os
-import plotly.express as px
-import geopandas as gpd
+import plotly.io as pio
+import graficos
+import instrumentacao
+import segundo_plano
+from cache_figuras import CacheFiguras
+from instrumentacao import etapa
+from codificacao import decodificar
+from consultas import ConsultasCubo, ConsultasDuckDB, motor_inicial, motores_disponiveis
+from fatores_risco import EVENTOS_POR_FATOR, TabelaFatores, analisar_fatores, carregar_contagens_fatores
+from fluxos import MatrizFluxos, carregar_contagens_fluxos
+from cubo import construir_cubo, ler_cubo, restringir_ufs
+from geometria import NIVEL_PADRAO, TOLERANCIAS, caminho_shapefile_uf, carregar_geojson_ufs, pontos_municipios
+from armazenamento import (COLUNAS_DASHBOARD, DTYPES_CSV, assinatura_arquivos, carregar_parquet, dataset_disponivel,
+                           filtro_dataset, ingerir_csv_para_parquet, lotes_por_uf, ufs_disponiveis)
+from ufs import REGIOES, UF_PADRAO, descrever_ufs, prefixos_ufs
 
 #ESTILIZANDO!
 st.set_page_config(layout='wide')
@@ -30,119 +42,315 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Caminho para o arquivo shapefile
-shapefile_path = os.path.join(os.getcwd(), 'shapefile', 'PB_Municipios_2022.shp')  # Certifique-se de que o nome do arquivo está correto
-
-# Carregar o shapefile
-gdf = gpd.read_file(shapefile_path)
-
-# Salvar como GeoJSON
-# gdf.to_file('municipios_paraiba.geojson', driver='GeoJSON')
+# Diagnóstico de desempenho (tempo e memória de cada etapa do rerun). Desligado
+# por padrão; liga pela sidebar ou com BPN_DIAGNOSTICO=1 no ambiente.
+diagnostico = st.sidebar.checkbox("Diagnóstico de desempenho", value=instrumentacao.ativo(), key="diagnostico_desempenho")
+instrumentacao.iniciar_execucao(diagnostico)
+
+# Motor das consultas agregadas (consultas.py): pandas sobre o cubo em memória ou,
+# se instalado, DuckDB direto sobre os arquivos (BPN_MOTOR_CONSULTAS=duckdb)
+motores_consultas = motores_disponiveis()
+motor_consultas = st.sidebar.selectbox("Motor de consultas", motores_consultas,
+                                       index=motores_consultas.index(motor_inicial()), key="motor_consultas")
+
+# Os carregamentos pesados (dados e geometrias) rodam em segundo plano, numa
+# thread (segundo_plano.py): a página desenha na hora e cada aba mostra o progresso
+# até as tarefas de que depende terminarem. Cada tarefa fica em st.cache_resource,
+# uma única cópia compartilhada por todas as sessões do processo. A assinatura
+# (caminho, mtime, tamanho) dos arquivos de origem faz parte da chave, e max_entries
+# descarta as entradas antigas quando algum arquivo muda. Os objetos devolvidos
+# pelas tarefas não devem ser alterados in-place.
+
+# Intervalo (s) entre as atualizações da barra de progresso das tarefas
+INTERVALO_PROGRESSO = 0.5
+
+# Função para criar o executor das tarefas em segundo plano (um por processo)
+@st.cache_resource(show_spinner=False)
+def executor_segundo_plano():
+    return segundo_plano.criar_executor()
+
+# Tarefa: carregar o GeoJSON simplificado do mapa das UFs em um nível de detalhe.
+# As versões simplificadas ficam em disco (geometria.py) e em memória aqui, então
+# entre reruns só os valores de cor do choropleth são recalculados.
+def tarefa_geojson(tarefa, ufs, nivel):
+    tarefa.avancar(0.1, 'Carregando as fronteiras dos municípios...')
+    with etapa(f'carregar_geojson_ufs[{nivel}]', 'io'):
+        geojson, faltando = carregar_geojson_ufs(ufs, nivel)
+    if faltando:
+        tarefa.avisar('warning', f'Sem shapefile para {", ".join(faltando)}; esses municípios ficam fora do mapa')
+    return geojson
+
+# Função para iniciar (uma vez por UFs e nível) o carregamento do GeoJSON do mapa
+@st.cache_resource(max_entries=len(TOLERANCIAS), show_spinner=False)
+def carregar_geojson_mapa(ufs, nivel, assinatura):
+    return segundo_plano.iniciar(executor_segundo_plano(), 'geometria', tarefa_geojson, ufs, nivel)
 
 
 
 # Caminho relativo para o diretório onde estão os arquivos .csv
 diretorio_csv = os.path.join(os.getcwd(), 'Dados_csv')
 
-# Função para carregar dados diretamente dos arquivos CSV
-def load_data(diretorio_csv):
-    dataframes = []
-    for arquivo in os.listdir(diretorio_csv):
-        if arquivo.endswith('.csv'):
-            caminho_completo = os.path.join(diretorio_csv, arquivo)
-            try:
-                # Definir os tipos de dados esperados para as colunas problemáticas
-                dtypes = {
-                    'IDADEMAE': 'float64',  # Exemplo, ajuste conforme necessário
-                    'CODMUNNASC': 'str',     # Manter como string
-                    'PESO': 'str'            # Manter como string antes da conversão
-                }
-                
-                # Carregar cada arquivo CSV em um DataFrame e adicionar à lista
-                df = pd.read_csv(caminho_completo, low_memory=False)
-                dataframes.append(df)
-            except Exception as e:
-                st.error(f'Erro ao ler o arquivo {arquivo}: {e}')
-    
+# Caminho do dataset Parquet gerado por armazenamento.py (particionado por UF/ANO)
+diretorio_parquet = os.path.join(os.getcwd(), 'Dados_parquet')
+
+# Tarefa: incorporar ao dataset Parquet os CSVs novos ou alterados (ex.: um ano
+# novo do DATASUS). Só esses arquivos são lidos, e só os cubos das partições deles
+# são remontados.
+def tarefa_sincronizacao(tarefa, diretorio_csv, diretorio_parquet):
+    tarefa.avancar(0.1, 'Incorporando novos arquivos ao dataset...')
+    with etapa('sincronizar_dataset', 'io'):
+        return ingerir_csv_para_parquet(diretorio_csv, diretorio_parquet)
+
+# Função para iniciar a sincronização (roda de novo apenas quando a pasta de CSVs muda)
+@st.cache_resource(max_entries=1, show_spinner=False)
+def sincronizar_dataset(diretorio_csv, diretorio_parquet, assinatura_csv):
+    return segundo_plano.iniciar(executor_segundo_plano(), 'sincronizacao', tarefa_sincronizacao, diretorio_csv, diretorio_parquet)
+
+# Seleção das UFs analisadas, em tempo de execução (Paraíba por padrão)
+ufs_dados = ufs_disponiveis(diretorio_parquet, diretorio_csv) or [UF_PADRAO]
+abrangencia = st.sidebar.selectbox("Abrangência", ['Estados selecionados', 'Nordeste', 'Brasil'], key="abrangencia")
+if abrangencia == 'Nordeste':
+    ufs_selecionadas = [uf for uf in REGIOES['Nordeste'] if uf in ufs_dados]
+elif abrangencia == 'Brasil':
+    ufs_selecionadas = ufs_dados
+else:
+    ufs_selecionadas = st.sidebar.multiselect(
+        "Estados (UF)",
+        ufs_dados,
+        default=[UF_PADRAO] if UF_PADRAO in ufs_dados else ufs_dados[:1],
+        key="ufs_selecionadas"
+    )
+if not ufs_selecionadas:
+    st.sidebar.warning(f'Nenhuma UF disponível na seleção; usando {ufs_dados[0]}.')
+    ufs_selecionadas = ufs_dados[:1]
+ufs_selecionadas = tuple(sorted(ufs_selecionadas))
+nome_abrangencia = descrever_ufs(ufs_selecionadas)
+
+# Função para carregar os dados das UFs selecionadas (dataset Parquet, se existir, ou os arquivos CSV).
+# Roda em segundo plano: erros e avisos vão para a tarefa, que a página exibe depois.
+def load_data(diretorio_csv, ufs, tarefa):
+    # Ler do dataset colunar apenas as colunas usadas e só as partições das UFs
+    # (o filtro é empurrado para a leitura; as demais partições nem são abertas)
+    if dataset_disponivel(diretorio_parquet):
+        try:
+            return carregar_parquet(diretorio_parquet, COLUNAS_DASHBOARD, filtro_dataset(ufs=ufs))
+        except Exception as e:
+            tarefa.avisar('error', f'Erro ao ler o dataset Parquet {diretorio_parquet}: {e}')
+
+    # Carregar cada arquivo CSV das UFs de uma vez, com os tipos esperados e só as colunas usadas
+    try:
+        dataframes = list(lotes_por_uf(ufs, COLUNAS_DASHBOARD, None, diretorio_csv, None, DTYPES_CSV))
+    except Exception as e:
+        tarefa.avisar('error', f'Erro ao ler os arquivos CSV de {diretorio_csv}: {e}')
+        dataframes = []
+
     # Concatenar todos os DataFrames em um único DataFrame, se houver dados
     if dataframes:
         df_total = pd.concat(dataframes, ignore_index=True)
         return df_total
     else:
-        st.warning('Nenhum arquivo .csv encontrado ou lido.')
+        tarefa.avisar('warning', 'Nenhum arquivo .csv encontrado ou lido.')
         return None
 
-# Carregar os dados CSV
-df_total = load_data(diretorio_csv)
-
-
-
-# Função para pré-processamento dos dados
-def preprocess_data(df):
+# Caminhos dos shapefiles das UFs selecionadas (geometria e nomes dos municípios)
+shapefiles_selecionados = [caminho_shapefile_uf(uf) for uf in ufs_selecionadas]
+
+# Função para carregar a correspondência código → nome dos municípios das UFs em cache
+# (vem do GeoJSON simplificado, que carrega CD_MUN e NM_MUN de cada município;
+# só é chamada depois que a tarefa do GeoJSON terminou)
+@st.cache_resource(max_entries=3, show_spinner=False)
+def carregar_mapeamento_municipios(ufs, assinatura):
+    geojson = carregar_geojson_mapa(ufs, NIVEL_PADRAO, assinatura).resultado()
+    return pd.DataFrame({
+        'CODMUNNASC': [str(feature['id']) for feature in geojson['features']],
+        'Nome_Municipio': [feature['properties']['NM_MUN'] for feature in geojson['features']],
+    })
+
+# Função para obter (uma vez por UFs e geometria) o ponto de cada município dos mapas
+# de fluxo; como a anterior, só é chamada depois que a tarefa do GeoJSON terminou
+@st.cache_resource(max_entries=3, show_spinner=False)
+def carregar_pontos_municipios(ufs, assinatura):
+    with etapa('pontos_municipios', 'shapely'):
+        return pontos_municipios(carregar_geojson_mapa(ufs, NIVEL_PADRAO, assinatura).resultado())
+
+# Tarefa: preparar as consultas agregadas do dashboard (consultas.py) no motor escolhido.
+# - duckdb: as consultas rodam em SQL sobre os arquivos; aqui só se calculam, numa
+#   passada, a faixa de idade e a lista de municípios.
+# - pandas: carrega o cubo de agregados (UF x município x ano x idade da mãe x baixo
+#   peso) restrito às UFs selecionadas e o índice de municípios sobre ele. Usa o cubo
+#   gravado na ingestão (montado fora da memória, em lotes), sem ler os registros;
+#   sem ele, carrega os registros (load_data) e monta o cubo a partir deles.
+def tarefa_dados(tarefa, diretorio_csv, ufs, motor):
+    if motor == 'duckdb':
+        tarefa.avancar(0.5, 'Preparando as consultas (DuckDB)...')
+        with etapa('consultas_duckdb', 'io'):
+            return ConsultasDuckDB(ufs, diretorio_parquet, diretorio_csv)
+
+    tarefa.avancar(0.05, 'Lendo o cubo de agregados...')
+    with etapa('ler_cubo', 'io'):
+        cubo = ler_cubo(diretorio_parquet) if dataset_disponivel(diretorio_parquet) else None
+    if cubo is None:
+        tarefa.avancar(0.1, 'Carregando dados do SINASC...')
+        with etapa('load_data', 'io'):
+            df_total = load_data(diretorio_csv, ufs, tarefa)
+        if df_total is None:
+            return None
+        tarefa.avancar(0.6, 'Montando o cubo de agregados...')
+        with etapa('construir_cubo', 'pandas'):
+            cubo = construir_cubo(df_total)
+    cubo = restringir_ufs(cubo, ufs)
+
+    tarefa.avancar(0.9, 'Indexando os municípios...')
+    with etapa('indexar_municipios', 'pandas'):
+        return ConsultasCubo(cubo)
+
+# Função para iniciar o carregamento dos dados (até 3 seleções de UFs/motor em cache ao mesmo tempo)
+@st.cache_resource(max_entries=3, show_spinner=False)
+def carregar_dados(diretorio_csv, ufs, assinatura, motor):
+    return segundo_plano.iniciar(executor_segundo_plano(), 'dados', tarefa_dados, diretorio_csv, ufs, motor)
+
+# Tarefa: contar os nascimentos por município, ano, padrão de exposição aos fatores
+# de risco e baixo peso (fatores_risco.py). Com a tabela de contagens, qualquer
+# seleção de municípios/anos é analisada sem reler os registros.
+def tarefa_fatores(tarefa, diretorio_csv, ufs):
+    tarefa.avancar(0.1, 'Contando os nascimentos por fator de risco...')
+    with etapa('carregar_contagens_fatores', 'io'):
+        contagens, codigos = carregar_contagens_fatores(ufs, diretorio_parquet, diretorio_csv)
+    if contagens is None or contagens.empty:
+        tarefa.avisar('error', 'Nenhum registro com os fatores de risco preenchidos.')
+        return None
+    tarefa.avancar(0.9, 'Montando a tabela de contagens...')
+    with etapa('tabela_fatores', 'numpy'):
+        return TabelaFatores(contagens, codigos)
+
+# Função para iniciar a contagem dos fatores de risco (mesma chave dos dados)
+@st.cache_resource(max_entries=3, show_spinner=False)
+def carregar_fatores(diretorio_csv, ufs, assinatura):
+    return segundo_plano.iniciar(executor_segundo_plano(), 'fatores', tarefa_fatores, diretorio_csv, ufs)
+
+# Tarefa: contar os nascimentos por município de residência, município do parto, ano
+# e baixo peso e montar as matrizes esparsas dos fluxos (fluxos.py). Os filtros da
+# aba só somam e consultam essas matrizes.
+def tarefa_fluxos(tarefa, diretorio_csv, ufs):
+    tarefa.avancar(0.1, 'Contando os nascimentos por residência e local do parto...')
+    with etapa('carregar_contagens_fluxos', 'io'):
+        contagens = carregar_contagens_fluxos(ufs, diretorio_parquet, diretorio_csv)
+    if contagens is None or contagens.empty:
+        tarefa.avisar('error', 'Nenhum registro com os municípios de residência e de nascimento preenchidos.')
+        return None
+    tarefa.avancar(0.9, 'Montando as matrizes de fluxos...')
+    with etapa('matriz_fluxos', 'scipy'):
+        return MatrizFluxos(contagens)
+
+# Função para iniciar a contagem dos fluxos (mesma chave dos dados)
+@st.cache_resource(max_entries=3, show_spinner=False)
+def carregar_fluxos(diretorio_csv, ufs, assinatura):
+    return segundo_plano.iniciar(executor_segundo_plano(), 'fluxos', tarefa_fluxos, diretorio_csv, ufs)
+
+# Função (fragmento) para exibir o progresso de uma tarefa em andamento. O fragmento
+# se reexecuta sozinho a cada INTERVALO_PROGRESSO s e, quando a tarefa termina,
+# reexecuta a página para o conteúdo que dependia dela aparecer.
+@st.fragment(run_every=INTERVALO_PROGRESSO)
+def exibir_progresso(tarefa):
+    if tarefa.pronta():
+        st.rerun()
+    st.progress(tarefa.progresso, text=tarefa.mensagem)
+
+# Função para obter o resultado de uma tarefa concluída, exibindo os avisos dela
+# (uma vez por execução, mesmo que várias abas usem a tarefa). Se a tarefa falhou,
+# mostra o erro e marca o cache que a guardava para ser limpo no fim da execução,
+# para a próxima execução tentar de novo.
+def resultado_tarefa(tarefa, funcao_cache):
+    primeira_vez = all(anterior is not tarefa for anterior in tarefas_execucao)
+    if primeira_vez:
+        tarefas_execucao.append(tarefa)
+        for nivel, mensagem in tarefa.avisos:
+            getattr(st, nivel)(mensagem)
     try:
-        # Converte a coluna DTNASC para datetime
-        df['DTNASC'] = pd.to_datetime(df['DTNASC'], format='%d%m%Y', errors='coerce')
-        
-        # Converte a coluna PESO para string, substitui vírgulas por pontos e remove espaços
-        df['PESO'] = df['PESO'].astype(str).str.replace(',', '.').str.strip()
-        
-        # Converter para float, forçando valores inválidos a serem NaN
-        df['PESO'] = pd.to_numeric(df['PESO'], errors='coerce')
-        
-        # Converter a idade da mãe para numérico
-        df['IDADEMAE'] = pd.to_numeric(df['IDADEMAE'], errors='coerce')
-
-        # Garantir que CODMUNNASC seja uma string
-        df['CODMUNNASC'] = df['CODMUNNASC'].fillna('').astype(str)
-
-        # Filtragem para pesos abaixo de 2500 e códigos de município que começam com '25'
-        df_baixo_peso = df[(df['PESO'] < 2500) & (df['PESO'] > 0) & (df['CODMUNNASC'].str.startswith('25'))].reset_index(drop=True)
-        
-        # Adiciona a coluna 'Ano' ao DataFrame df_baixo_peso
-        df_baixo_peso['Ano'] = df_baixo_peso['DTNASC'].dt.year
-
-        return df_baixo_peso
+        return tarefa.resultado()
     except Exception as e:
-        st.error(f"Erro durante o pré-processamento: {e}")
+        if primeira_vez:
+            st.error(f'Erro no carregamento ({tarefa.nome}): {e}')
+            caches_falhos.append(funcao_cache)
         return None
 
-# Inicializa df_baixo_peso como None
-df_baixo_peso = None
-
-# Carregar e preparar a correspondência de nomes dos municípios
-gdf_municipios = gpd.read_file('municipios_paraiba.geojson')
-print(gdf_municipios.columns)
-municipios_mapping = gdf_municipios[['CD_MUN', 'NM_MUN']].copy()
-municipios_mapping.columns = ['CODMUNNASC', 'Nome_Municipio']
-
-# Garantir que CODMUNNASC seja string para corresponder com os DataFrames
-municipios_mapping['CODMUNNASC'] = municipios_mapping['CODMUNNASC'].astype(str)
-
-# Mesclar o nome do município em df_baixo_peso e df_total
-if df_total is not None:
-    df_total = df_total.merge(municipios_mapping, on='CODMUNNASC', how='left')
-    df_baixo_peso = preprocess_data(df_total)  # Chama a função de pré-processamento
-    if df_baixo_peso is not None:
-        df_baixo_peso = df_baixo_peso.merge(municipios_mapping, on='CODMUNNASC', how='left')
-
-# Função para calcular métricas
-def calculate_metrics(df_total, df_baixo_peso):
-    if df_total is not None and df_baixo_peso is not None:
-        soma_total_nascidos = len(df_total)
-        soma_nascidos_abaixo_peso = len(df_baixo_peso)
-        taxa_total_pb = (soma_nascidos_abaixo_peso / soma_total_nascidos) * 100
-        media_idade_mae = df_total['IDADEMAE'].mean()
-
-        return soma_nascidos_abaixo_peso, soma_total_nascidos, taxa_total_pb, media_idade_mae
-
-    return None, None, None, None
-
-
-# Função para visualização geral
-def display_general_analysis(df_baixo_peso, df_total):
+# Limite de memória do cache de figuras serializadas (MB)
+LIMITE_CACHE_FIGURAS_MB = 64
+
+# Função para criar o cache de figuras (um por processo, compartilhado pelas sessões)
+@st.cache_resource(show_spinner=False)
+def cache_figuras():
+    return CacheFiguras(LIMITE_CACHE_FIGURAS_MB * 1024 * 1024)
+
+# Versão do Streamlit (a fixada em requirements.txt) cujo st.plotly_chart é reproduzido
+# em emitir_plotly_serializado
+VERSAO_STREAMLIT_PLOTLY = '1.37.1'
+
+# Função para enviar ao navegador uma figura já serializada (JSON do Plotly) sem
+# serializá-la de novo: repete o caminho de st.plotly_chart (sem seleção) do Streamlit
+# 1.37.1, só que com o JSON do cache no lugar do to_json da figura. Usa módulos
+# internos do Streamlit, por isso fica presa à versão fixada.
+def emitir_plotly_serializado(payload):
+    import json
+    from streamlit.elements.form import current_form_id
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    from streamlit.runtime.state.common import compute_widget_id
+
+    dg = st.plotly_chart.__self__
+    proto = PlotlyChartProto()
+    proto.use_container_width = False
+    proto.theme = 'streamlit'
+    proto.form_id = current_form_id(dg)
+    proto.spec = payload
+    proto.config = json.dumps({'showLink': False, 'linkText': False})
+    ctx = get_script_run_ctx()
+    proto.id = compute_widget_id(
+        'plotly_chart', user_key=None, key=None, plotly_spec=proto.spec, plotly_config=proto.config,
+        selection_mode=('points', 'box', 'lasso'), is_selection_activated=False, theme='streamlit',
+        form_id=proto.form_id, use_container_width=False, page=ctx.active_script_hash if ctx else None)
+    return dg._enqueue('plotly_chart', proto)
+
+# Função para exibir uma figura já serializada. Na versão fixada do Streamlit, o JSON do
+# cache vai direto para o navegador; em outra versão, ou se o caminho interno falhar,
+# recria a figura e usa a API pública (que valida e serializa de novo).
+def plotly_chart_serializado(payload):
+    if st.__version__ == VERSAO_STREAMLIT_PLOTLY:
+        try:
+            return emitir_plotly_serializado(payload)
+        except Exception:
+            pass
+    return st.plotly_chart(pio.from_json(payload))
+
+# Função para exibir um gráfico pelo cache de figuras. A chave junta o tipo do gráfico,
+# as UFs, os filtros e a versão dos dados (assinatura dos arquivos); construir() só roda
+# (agregação pandas + figura) quando a combinação ainda não está no cache.
+def exibir_grafico(tipo, filtros, construir):
+    with etapa(f'figura_{tipo}', 'plotly'):
+        payload = cache_figuras().obter((tipo, ufs_selecionadas, filtros, assinatura_dados, assinatura_geometria), construir)
+    with etapa(f'render_{tipo}', 'render'):
+        plotly_chart_serializado(payload)
+
+# Iniciar as tarefas (ou reaproveitar as que já estão em cache). A sincronização do
+# dataset vem antes, porque ela muda a assinatura dos dados.
+tarefas_execucao = []
+caches_falhos = []
+assinatura_geometria = assinatura_arquivos(*shapefiles_selecionados)
+carregar_geojson_mapa(ufs_selecionadas, NIVEL_PADRAO, assinatura_geometria)
+tarefa_carregamento, assinatura_dados = None, None
+if dataset_disponivel(diretorio_parquet) and os.path.isdir(diretorio_csv):
+    tarefa_carregamento = sincronizar_dataset(diretorio_csv, diretorio_parquet, assinatura_arquivos(diretorio_csv))
+    if tarefa_carregamento.pronta():
+        resultado_tarefa(tarefa_carregamento, sincronizar_dataset)
+        tarefa_carregamento = None
+if tarefa_carregamento is None:
+    assinatura_dados = assinatura_arquivos(diretorio_csv, diretorio_parquet)
+    tarefa_carregamento = carregar_dados(diretorio_csv, ufs_selecionadas, assinatura_dados, motor_consultas)
+
+# Função para visualização geral (respondida pelas consultas agregadas)
+def display_general_analysis(consultas):
     # Criar um filtro deslizante para a idade da mãe
-    idade_mae_min = int(df_total['IDADEMAE'].min())
-    idade_mae_max = int(df_total['IDADEMAE'].max())
+    idade_mae_min, idade_mae_max = consultas.faixa_idade()
     
     # Usar uma chave única para o slider de idade da mãe
     idade_mae_selecionada = st.slider(
@@ -153,19 +361,9 @@ def display_general_analysis(df_baixo_peso, df_total):
         key="idade_mae_slider_geral"  # Chave única
     )
 
-    # Filtrar os dados de df_total e df_baixo_peso com base na idade da mãe
-    df_filtrado_total = df_total[
-        (df_total['IDADEMAE'] >= idade_mae_selecionada[0]) &
-        (df_total['IDADEMAE'] <= idade_mae_selecionada[1])
-    ]
-    
-    df_baixo_peso_filtrado = df_baixo_peso[
-        (df_baixo_peso['IDADEMAE'] >= idade_mae_selecionada[0]) &
-        (df_baixo_peso['IDADEMAE'] <= idade_mae_selecionada[1])
-    ]
-
-    # Calcular as métricas com base nos dados filtrados
-    total_baixo_peso, total_nascidos, taxa_pb, media_idade_mae = calculate_metrics(df_filtrado_total, df_baixo_peso_filtrado)
+    # Calcular as métricas na faixa de idade da mãe selecionada
+    with etapa('metricas_gerais', consultas.motor):
+        total_baixo_peso, total_nascidos, taxa_pb, media_idade_mae = consultas.metricas(idade_mae_selecionada)
 
     if total_baixo_peso is not None:
         # Criar 4 colunas para exibir as métricas
@@ -185,148 +383,207 @@ def display_general_analysis(df_baixo_peso, df_total):
             st.metric("Média da Idade das Mães", f"{media_idade_mae:.2f}")
 
         # Adicionar gráfico de evolução do número de nascimentos ao longo dos anos
-        plot_nascimentos_por_ano(df_filtrado_total, df_baixo_peso_filtrado)
+        plot_nascimentos_por_ano(consultas, idade_mae_selecionada)
 
 
-# Função Plot por
-def plot_nascimentos_por_ano(df_total, df_baixo_peso):
+# Função Plot por (a faixa de idade da mãe entra na chave do cache de figuras)
+def plot_nascimentos_por_ano(consultas, faixa_idade):
     # Verificar se os dados estão disponíveis
-    if df_total is not None:
-        # Converter a coluna DTNASC para datetime se ainda não estiver
-        df_total['DTNASC'] = pd.to_datetime(df_total['DTNASC'], format='%d%m%Y', errors='coerce')
-
-        # Extrair o ano da data de nascimento
-        df_total['Ano'] = df_total['DTNASC'].dt.year
+    if consultas is not None:
+        def construir():
+            # Contar o número de nascimentos (total e abaixo do peso) por ano
+            with etapa('nascimentos_por_ano', consultas.motor):
+                df_combined = consultas.nascimentos_por_ano(faixa_idade)
 
-        # Contar o número de nascimentos por ano
-        nascimentos_por_ano = df_total.groupby('Ano').size().reset_index(name='Total_Nascimentos')
-        nascimentos_baixo_peso_por_ano = df_baixo_peso.groupby('Ano').size().reset_index(name='Total_Baixo_Peso')
-
-        # Mesclar os DataFrames para que ambos apareçam no gráfico
-        df_combined = pd.merge(nascimentos_por_ano, nascimentos_baixo_peso_por_ano, on='Ano', how='outer')
-
-        # Criar o gráfico de linha
-        fig = px.line(df_combined, x='Ano', y=['Total_Nascimentos', 'Total_Baixo_Peso'],
-                      title='Evolução do Número de Nascimentos ao Longo dos Anos',
-                      labels={'value': 'Total', 'Ano': 'Ano'},
-                      markers=True)
+            # Criar o gráfico de linha
+            return graficos.figura_nascimentos_por_ano(df_combined)
 
         # Exibir o gráfico
-        st.plotly_chart(fig)
+        exibir_grafico('nascimentos_por_ano', tuple(faixa_idade), construir)
     else:
         st.warning('Nenhum dado disponível para plotar.')
 
 # Função para visualização por município
-def display_municipal_analysis(df_baixo_peso, df_total):
-
-    # Calcular métricas por município
-    metrics = df_baixo_peso['CODMUNNASC'].value_counts().reset_index()
-    metrics.columns = ['CODMUNNASC', 'Nascimentos_Abaixo_Peso']
-
-    total_nascimentos = df_total['CODMUNNASC'].value_counts().reset_index()
-    total_nascimentos.columns = ['CODMUNNASC', 'Total_Nascimentos']
-
-    # Mesclar os DataFrames
-    merged = pd.merge(metrics, total_nascimentos, on='CODMUNNASC', how='outer')
-    merged['Taxa_Abaixo_Peso'] = (merged['Nascimentos_Abaixo_Peso'] / merged['Total_Nascimentos']) * 100
-    merged.fillna(0, inplace=True)  # Preencher NaN com 0
-
-    # Criar um GeoDataFrame da Paraíba
-    gdf_municipios = gpd.read_file('municipios_paraiba.geojson')  # Caminho do GeoJSON
-    gdf_municipios['CODMUNNASC'] = gdf_municipios['CD_MUN'].astype(str)  # Usar a coluna correta
-
-    # Mesclar o GeoDataFrame com as métricas
-    gdf_merged = gdf_municipios.merge(merged, on='CODMUNNASC', how='left')
-
-    # Criar o gráfico choropleth
-    fig = px.choropleth(
-        gdf_merged,
-        geojson=gdf_merged.geometry,
-        locations=gdf_merged.index,
-        color='Taxa_Abaixo_Peso',  # Usar a taxa de nascimentos abaixo do peso
-        hover_name='NM_MUN',
-        hover_data=['Nascimentos_Abaixo_Peso', 'Total_Nascimentos'],
-        color_continuous_scale=px.colors.sequential.YlOrRd,  # Amarelo para vermelho
-        labels={'Taxa_Abaixo_Peso': 'Taxa de Nascimentos Abaixo do Peso (%)'}
+def display_municipal_analysis(consultas):
+
+    # Nível de detalhe das fronteiras (geometrias pré-simplificadas em cache)
+    nivel = st.selectbox(
+        "Nível de detalhe do mapa:",
+        list(TOLERANCIAS),
+        index=list(TOLERANCIAS).index(NIVEL_PADRAO),
+        key="nivel_detalhe_mapa"
     )
-
-    # Ajustes para o gráfico
-    fig.update_geos(
-        fitbounds="locations",
-        visible=False,
-        bgcolor='rgba(0,0,0,0)')  #transparente
-    
-    # Ajusta o mapa
-    fig.update_layout(
-        height=600 ,
-        title_text='Taxa de Nascimentos Abaixo do Peso por Município na Paraíba',
-        paper_bgcolor='rgba(0,0,0,0)',  # Fundo do gráfico transparente
-        plot_bgcolor='rgba(0,0,0,0)',    # Fundo da área de plotagem transparente
-        coloraxis_colorbar=dict(title="Nascimentos Abaixo do Peso (%)")  # Título da barra de cores
-    )
-
-    # Exibir o gráfico
-    st.plotly_chart(fig)  # Verifique se esta é a única chamada
-
-# Função para visualização municipal comparativa
-def display_municipal_analysis_comparative(df_baixo_peso, df_total):
-    municipios = df_baixo_peso['Nome_Municipio'].unique().tolist()
-    selected_municipios = st.multiselect("Selecione dois municípios para comparação", municipios)
-
-    if len(selected_municipios) == 2:
-        # Filtra os dados para os municípios selecionados
-        df_municipio1 = df_baixo_peso[df_baixo_peso['Nome_Municipio'] == selected_municipios[0]]
-        df_municipio2 = df_baixo_peso[df_baixo_peso['Nome_Municipio'] == selected_municipios[1]]
-
-        # Criar um DataFrame com as métricas
-        metricas = {
-            'Municipio': [selected_municipios[0], selected_municipios[1]],
-            'Nascimentos Abaixo do Peso': [len(df_municipio1), len(df_municipio2)],
-            'Total de Nascimentos': [
-                len(df_total[df_total['Nome_Municipio'] == selected_municipios[0]]),
-                len(df_total[df_total['Nome_Municipio'] == selected_municipios[1]])
-            ]
-        }
-        
-        # Calcular a taxa de nascimento abaixo do peso
-        taxa_nascimento_abaixo_peso = [
-            (len(df_municipio1) / len(df_total[df_total['Nome_Municipio'] == selected_municipios[0]])) * 100,
-            (len(df_municipio2) / len(df_total[df_total['Nome_Municipio'] == selected_municipios[1]])) * 100
-        ]
-        metricas['Taxa de Nascimento Abaixo do Peso (%)'] = taxa_nascimento_abaixo_peso
-        
-        df_metricas = pd.DataFrame(metricas)
-
-        # Exibir métricas lado a lado
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.subheader(selected_municipios[0])
-            st.metric("Nascimentos Abaixo do Peso", df_metricas['Nascimentos Abaixo do Peso'][0])
-            st.metric("Total de Nascimentos", df_metricas['Total de Nascimentos'][0])
-            st.metric("Taxa de Nascimento Abaixo do Peso (%)", round(df_metricas['Taxa de Nascimento Abaixo do Peso (%)'][0], 2))
-
-        with col2:
-            st.subheader(selected_municipios[1])
-            st.metric("Nascimentos Abaixo do Peso", df_metricas['Nascimentos Abaixo do Peso'][1])
-            st.metric("Total de Nascimentos", df_metricas['Total de Nascimentos'][1])
-            st.metric("Taxa de Nascimento Abaixo do Peso (%)", round(df_metricas['Taxa de Nascimento Abaixo do Peso (%)'][1], 2))
+    tarefa_geojson = carregar_geojson_mapa(ufs_selecionadas, nivel, assinatura_geometria)
+    if not tarefa_geojson.pronta():
+        exibir_progresso(tarefa_geojson)
+        return
+    geojson = resultado_tarefa(tarefa_geojson, carregar_geojson_mapa)
+    if geojson is None:
+        return
+
+    def construir():
+        # Calcular métricas por município
+        with etapa('taxa_por_municipio', consultas.motor):
+            merged = consultas.taxa_por_municipio()
+
+        # Mesclar os municípios das UFs selecionadas com as métricas
+        with etapa('dados_mapa', 'pandas'):
+            gdf_merged = graficos.dados_mapa(geojson, merged)
+
+        # Criar o gráfico choropleth
+        return graficos.figura_mapa(gdf_merged, geojson, f'Taxa de Nascimentos Abaixo do Peso por Município ({nome_abrangencia})')
+
+    # Exibir o gráfico (um por nível de detalhe no cache)
+    exibir_grafico('mapa', nivel, construir)
+
+# Função para visualização municipal comparativa (N municípios, respondida pelo
+# índice município → células do cubo ou por consulta filtrada pelos municípios no DuckDB)
+def display_municipal_analysis_comparative(consultas):
+    # Os nomes vêm da malha; sem ela (ainda carregando ou com erro), os municípios
+    # aparecem pelo código, como nas abas de fatores e de fluxos
+    nomes, contagem_nomes = {}, {}
+    tarefa_geojson = carregar_geojson_mapa(ufs_selecionadas, NIVEL_PADRAO, assinatura_geometria)
+    if not tarefa_geojson.pronta():
+        exibir_progresso(tarefa_geojson)
+    elif resultado_tarefa(tarefa_geojson, carregar_geojson_mapa) is not None:
+        mapeamento = carregar_mapeamento_municipios(ufs_selecionadas, assinatura_geometria)
+        nomes = dict(zip(mapeamento['CODMUNNASC'], mapeamento['Nome_Municipio']))
+        contagem_nomes = mapeamento['Nome_Municipio'].value_counts()
+
+    # Nomes repetidos (municípios homônimos em UFs diferentes) levam o código junto
+    def rotulo(codigo):
+        nome = nomes.get(codigo)
+        if nome is None:
+            return codigo
+        return f"{nome} ({codigo})" if contagem_nomes.get(nome, 0) > 1 else nome
+
+    prefixos = prefixos_ufs(ufs_selecionadas)
+    municipios = sorted((codigo for codigo in consultas.municipios() if codigo.startswith(prefixos)), key=rotulo)
+    selected_municipios = st.multiselect("Selecione os municípios para comparação", municipios,
+                                         format_func=rotulo, key="municipios_comparacao")
+
+    if len(selected_municipios) >= 2:
+        # Métricas de cada município selecionado
+        with etapa('comparar_municipios', consultas.motor):
+            df_metricas = consultas.comparar_municipios(selected_municipios)
+            df_metricas.insert(0, 'Municipio', [rotulo(codigo) for codigo in df_metricas['CODMUNNASC']])
+
+        # Exibir métricas lado a lado (em tabela quando há muitos municípios)
+        if len(df_metricas) <= 4:
+            for coluna, metricas in zip(st.columns(len(df_metricas)), df_metricas.itertuples(index=False)):
+                with coluna:
+                    st.subheader(metricas[0])
+                    st.metric("Nascimentos Abaixo do Peso", metricas[2])
+                    st.metric("Total de Nascimentos", metricas[3])
+                    st.metric("Taxa de Nascimento Abaixo do Peso (%)", round(metricas[4], 2))
+        else:
+            st.dataframe(df_metricas.drop(columns='CODMUNNASC'), hide_index=True)
 
         # Criar um gráfico comparativo
-        fig = px.bar(df_metricas, x='Municipio', 
-                     y=['Nascimentos Abaixo do Peso', 'Total de Nascimentos'], 
-                     title='Comparativo de Nascimentos Abaixo do Peso por Município')
+        exibir_grafico('comparativa', tuple(selected_municipios), lambda: graficos.figura_comparativa(df_metricas))
 
-        st.plotly_chart(fig)
-    else:
-        st.warning("Por favor, selecione exatamente dois municípios para comparação.")
+        # Detalhamento por ano (a tabela abaixo do gráfico também usa)
+        with etapa('comparar_municipios_por_ano', consultas.motor):
+            df_por_ano = consultas.comparar_municipios_por_ano(selected_municipios)
+            df_por_ano.insert(0, 'Municipio', df_por_ano['CODMUNNASC'].map(rotulo))
 
+        exibir_grafico('comparativa_por_ano', tuple(selected_municipios), lambda: graficos.figura_comparativa_por_ano(df_por_ano))
 
+        with st.expander("Detalhamento por ano"):
+            st.dataframe(df_por_ano.drop(columns='CODMUNNASC'), hide_index=True)
+    else:
+        st.warning("Por favor, selecione ao menos dois municípios para comparação.")
+
+
+
+# Função para a análise dos fatores de risco de uma seleção de municípios e anos
+# (taxas por fator, razões de chances brutas e ajustadas por regressão logística)
+def display_risk_factor_analysis(tabela):
+    nomes = {}
+    tarefa_geojson = carregar_geojson_mapa(ufs_selecionadas, NIVEL_PADRAO, assinatura_geometria)
+    if tarefa_geojson.pronta() and resultado_tarefa(tarefa_geojson, carregar_geojson_mapa) is not None:
+        mapeamento = carregar_mapeamento_municipios(ufs_selecionadas, assinatura_geometria)
+        nomes = dict(zip(mapeamento['CODMUNNASC'], mapeamento['Nome_Municipio']))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        municipios = st.multiselect("Municípios (vazio = todos)", sorted(tabela.municipios, key=lambda codigo: nomes.get(codigo, codigo)),
+                                    format_func=lambda codigo: nomes.get(codigo, codigo), key="municipios_fatores")
+        por_municipio = st.checkbox("Um resultado por município", key="fatores_por_municipio")
+    with col2:
+        anos = st.multiselect("Anos (vazio = todos)", tabela.anos, key="anos_fatores")
+        reamostras = st.select_slider("Reamostras de bootstrap", [0, 100, 200, 500], value=0, key="reamostras_fatores")
+
+    with etapa('analisar_fatores', 'numpy'):
+        taxas, razoes = analisar_fatores(tabela, municipios or None, anos or None, por_municipio, reamostras)
+    taxas['Grupo'] = taxas['Grupo'].map(lambda codigo: nomes.get(codigo, codigo))
+    razoes['Grupo'] = razoes['Grupo'].map(lambda codigo: nomes.get(codigo, codigo))
+
+    if razoes['OR ajustada'].notna().any():
+        with etapa('figura_razoes_de_chances', 'plotly'):
+            fig = graficos.figura_razoes_de_chances(razoes)
+        with etapa('render_razoes_de_chances', 'render'):
+            st.plotly_chart(fig)
+    if not razoes['Convergiu'].all():
+        st.info(f"Sem razão de chances ajustada nos grupos com menos de {EVENTOS_POR_FATOR} nascimentos abaixo do peso "
+                "por fator ou sem nascimentos em alguma combinação de fator e desfecho.")
+    st.dataframe(razoes, hide_index=True)
+    st.dataframe(taxas, hide_index=True)
+
+    # Taxas por categoria das colunas dos fatores: as contagens ficam por código e só
+    # a tabela exibida recebe os rótulos do SINASC
+    with st.expander("Baixo peso por categoria (consultas, gestação e gravidez)"):
+        for coluna in tabela.codigos:
+            with etapa(f'distribuicao_{coluna}', 'numpy'):
+                distribuicao = decodificar(tabela.distribuicao(coluna, municipios or None, anos or None))
+                distribuicao[coluna] = distribuicao[coluna].cat.add_categories('Sem informação').fillna('Sem informação')
+            st.dataframe(distribuicao, hide_index=True)
+    st.caption(f"{tabela.incompletos} registros sem peso, ano, município ou algum dos fatores preenchido ficaram de fora.")
+
+
+# Função para a análise dos fluxos entre o município de residência da mãe e o do
+# parto: ranking de entradas/saídas, maiores fluxos e mapa de fluxos
+def display_flow_analysis(matriz):
+    nomes, pontos = {}, None
+    tarefa_geojson = carregar_geojson_mapa(ufs_selecionadas, NIVEL_PADRAO, assinatura_geometria)
+    if not tarefa_geojson.pronta():
+        # Tabelas já saem com os códigos; nomes e mapa entram quando a tarefa terminar
+        exibir_progresso(tarefa_geojson)
+    elif resultado_tarefa(tarefa_geojson, carregar_geojson_mapa) is not None:
+        pontos = carregar_pontos_municipios(ufs_selecionadas, assinatura_geometria)
+        nomes = dict(zip(pontos['codigo'], pontos['nome']))
+
+    col1, col2 = st.columns(2)
+    with col1:
+        sentido = st.radio("Sentido", ['entradas', 'saidas'], horizontal=True, key="sentido_fluxos",
+                           format_func=lambda valor: {'entradas': 'Entradas (partos de não residentes)',
+                                                      'saidas': 'Saídas (residentes com parto fora)'}[valor])
+        municipio = st.selectbox("Município (vazio = todos)", [None] + sorted(matriz.municipios, key=lambda codigo: nomes.get(codigo, codigo)),
+                                 format_func=lambda codigo: 'Todos' if codigo is None else nomes.get(codigo, codigo), key="municipio_fluxos")
+    with col2:
+        anos = st.multiselect("Anos (vazio = todos)", matriz.anos, key="anos_fluxos")
+        k = st.slider("Quantidade de fluxos", 5, 50, 20, step=5, key="k_fluxos")
+    anos = tuple(anos) or None
+
+    with etapa('ranking_fluxos', 'scipy'):
+        ranking = matriz.ranking(sentido, k, anos)
+        fluxos = matriz.principais_fluxos(k, anos, origem=municipio if sentido == 'saidas' else None,
+                                          destino=municipio if sentido == 'entradas' else None)
+
+    if pontos is not None and len(fluxos):
+        titulo = f"Principais Fluxos de Partos ({'todos os anos' if anos is None else ', '.join(map(str, anos))})"
+        exibir_grafico('fluxos', (sentido, municipio, anos, k), lambda: graficos.figura_fluxos(fluxos, pontos, titulo))
+    st.dataframe(fluxos.assign(CODMUNRES=fluxos['CODMUNRES'].map(lambda codigo: nomes.get(codigo, codigo)),
+                               CODMUNNASC=fluxos['CODMUNNASC'].map(lambda codigo: nomes.get(codigo, codigo)))
+                 .rename(columns={'CODMUNRES': 'Residência', 'CODMUNNASC': 'Parto'}), hide_index=True)
+    st.subheader(f"Municípios com mais {'entradas' if sentido == 'entradas' else 'saídas'}")
+    st.dataframe(ranking.assign(Municipio=ranking['Municipio'].map(lambda codigo: nomes.get(codigo, codigo))), hide_index=True)
+    st.caption("Só entram as mães residentes nas UFs selecionadas: as entradas de mães de outras UFs não aparecem.")
 
 
 st.title('Análise de Baixo Peso ao Nascer')
 
-tab1, tab2, tab3 = st.tabs(["Página Inicial", "Visualização Geral", "Visualização Municipal"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["Página Inicial", "Visualização Geral", "Visualização Municipal", "Fatores de Risco", "Fluxos de Partos"])
 
 # Página Inicial
 with tab1:
@@ -365,23 +622,90 @@ with tab1:
 
 # Página de Visualização Geral do Estado
 with tab2:
-    st.header("Visualização Geral do Estado (Paraíba)")
-    
-    if df_total is not None:
-        df_baixo_peso = preprocess_data(df_total)
-        if df_baixo_peso is not None:
-            display_municipal_analysis(df_baixo_peso, df_total)
-            display_general_analysis(df_baixo_peso, df_total)
+    st.header(f"Visualização Geral ({nome_abrangencia})")
+
+    consultas_dados = None
+    if not tarefa_carregamento.pronta():
+        exibir_progresso(tarefa_carregamento)
     else:
-        st.error('Nenhum dado disponível para processamento.')
+        consultas_dados = resultado_tarefa(tarefa_carregamento, carregar_dados)
+        if consultas_dados is not None:
+            # Métricas, série anual e mapa vêm das consultas agregadas (cubo em cache ou DuckDB)
+            display_municipal_analysis(consultas_dados)
+            display_general_analysis(consultas_dados)
+        else:
+            st.error('Nenhum dado disponível para processamento.')
 
 # Página de Visualização Municipal
 # Página de Visualização Municipal
 with tab3:
     st.header("Visualização Comparativo Municipal")
 
-    if df_total is not None:
-        df_baixo_peso = preprocess_data(df_total)
-        if df_baixo_peso is not None:
-            # Exibir visualização municipal comparativa
-            display_municipal_analysis_comparative(df_baixo_peso,df_total)  # Passar apenas df_baixo_peso
+    if not tarefa_carregamento.pronta():
+        exibir_progresso(tarefa_carregamento)
+    # Usa as mesmas consultas agregadas da visualização geral
+    elif consultas_dados is not None:
+        # Exibir visualização municipal comparativa
+        display_municipal_analysis_comparative(consultas_dados)
+
+# Página de Fatores de Risco
+with tab4:
+    st.header(f"Fatores de Risco ({nome_abrangencia})")
+
+    # Espera a sincronização do dataset, que muda a assinatura dos dados
+    if not tarefa_carregamento.pronta():
+        exibir_progresso(tarefa_carregamento)
+    else:
+        tarefa_contagens = carregar_fatores(diretorio_csv, ufs_selecionadas, assinatura_dados)
+        if not tarefa_contagens.pronta():
+            exibir_progresso(tarefa_contagens)
+        else:
+            tabela_fatores = resultado_tarefa(tarefa_contagens, carregar_fatores)
+            if tabela_fatores is not None:
+                display_risk_factor_analysis(tabela_fatores)
+
+# Página de Fluxos de Partos (residência da mãe → local do parto)
+with tab5:
+    st.header(f"Fluxos de Partos ({nome_abrangencia})")
+
+    if not tarefa_carregamento.pronta():
+        exibir_progresso(tarefa_carregamento)
+    else:
+        tarefa_matriz_fluxos = carregar_fluxos(diretorio_csv, ufs_selecionadas, assinatura_dados)
+        if not tarefa_matriz_fluxos.pronta():
+            exibir_progresso(tarefa_matriz_fluxos)
+        else:
+            matriz_fluxos = resultado_tarefa(tarefa_matriz_fluxos, carregar_fluxos)
+            if matriz_fluxos is not None:
+                display_flow_analysis(matriz_fluxos)
+
+# Painel de diagnóstico: etapas do rerun (nível 0 = etapa de topo; as internas às
+# funções em cache só aparecem quando há cache miss) e exportação em JSON lines
+if instrumentacao.ativo():
+    registros_execucao = instrumentacao.registros()
+    # Etapas das tarefas em segundo plano usadas nesta página (medidas quando rodaram),
+    # marcadas com o nome da tarefa
+    registros_tarefas = [{'tarefa': tarefa.nome, **registro} for tarefa in tarefas_execucao for registro in tarefa.registros]
+    contexto_execucao = {'ufs': ','.join(ufs_selecionadas), 'total_execucao_s': round(instrumentacao.duracao_execucao(), 4)}
+    instrumentacao.exportar_jsonl(registros_execucao + [{'tarefa': tarefa.nome, **registro} for tarefa in tarefas_execucao
+                                                        for registro in tarefa.registros_para_exportar()], **contexto_execucao)
+    with st.expander("Diagnóstico de desempenho", expanded=False):
+        st.write(f"Tempo total do rerun: {contexto_execucao['total_execucao_s']:.3f} s")
+        if registros_execucao:
+            df_diagnostico = pd.DataFrame(registros_execucao)
+            st.dataframe(df_diagnostico, hide_index=True)
+            st.bar_chart(df_diagnostico[df_diagnostico['nivel'] == 0].groupby('categoria')['segundos'].sum())
+        if registros_execucao or registros_tarefas:
+            st.download_button("Exportar (JSON lines)",
+                               instrumentacao.registros_jsonl(registros_execucao + registros_tarefas, **contexto_execucao),
+                               file_name='diagnostico.jsonl', mime='application/x-ndjson')
+        st.write("Cache de figuras:")
+        st.dataframe(pd.DataFrame([cache_figuras().estatisticas()]), hide_index=True)
+        if registros_tarefas:
+            st.write("Carregamentos em segundo plano:")
+            st.dataframe(pd.DataFrame(registros_tarefas), hide_index=True)
+
+# Caches das tarefas que falharam nesta execução: limpos só no fim, para as outras abas
+# não iniciarem de novo a mesma tarefa no mesmo rerun
+for funcao_cache in caches_falhos:
+    funcao_cache.clear()
@@ -1,36 +1,183 @@
+import os
+import argparse
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dbfread import DBF
-import os
+from armazenamento import atualizar_cubo, caminho_particao, esquema_arrow, particao_do_arquivo, tipar_dataframe
+from manifesto import arquivos_pendentes, registrar_ingestao
+from validacao import combinar_relatorios, gravar_validacao, validar_lote
 
 # Caminho do diretório de arquivos .dbf
 diretorio_dbf = r"C:\Users\PICHAU\Desktop\menu\Estudos\Estudos UFPB\Tec. Pesquisa e Análise de Dados\Análise DATASUS SINASC\Ignorar\tratados\PB"
 # Caminho do diretório onde serão salvos os arquivos .csv
 diretorio_csv = r"C:\Users\PICHAU\Desktop\menu\Estudos\Estudos UFPB\Tec. Pesquisa e Análise de Dados\Análise DATASUS SINASC\Dados_csv"
 
-# Criar diretório para salvar os arquivos CSV, caso ainda não exista
-os.makedirs(diretorio_csv, exist_ok=True)
-
-# Função para converter arquivos DBF para CSV
-def converter_dbf_para_csv(diretorio_dbf, diretorio_csv):
-    for arquivo in os.listdir(diretorio_dbf):
-        if arquivo.endswith('.dbf'):
-            caminho_dbf = os.path.join(diretorio_dbf, arquivo)
+# Quantidade de registros do DBF mantidos em memória por vez
+TAMANHO_LOTE = 50_000
+
+# Codificação dos DBFs do DATASUS
+CODIFICACAO_DBF = 'latin-1'
+
+
+# Função para ler um DBF em lotes de tamanho fixo, já separados em buffers por coluna.
+# Só um lote fica em memória por vez, qualquer que seja o tamanho do arquivo. Os
+# buffers são listas Python, não arrays tipados: o dbfread entrega cada registro
+# como um dicionário de valores Python, então o custo por campo já existe de
+# qualquer forma. Os tipos só são aplicados depois da validação (tipar_dataframe).
+def ler_dbf_em_lotes(caminho_dbf, tamanho_lote=TAMANHO_LOTE):
+    dbf = DBF(caminho_dbf, encoding=CODIFICACAO_DBF, load=False)
+    colunas = dbf.field_names
+    buffers = {coluna: [] for coluna in colunas}
+    quantidade = 0
+    for registro in dbf:
+        for coluna in colunas:
+            buffers[coluna].append(registro[coluna])
+        quantidade += 1
+        if quantidade == tamanho_lote:
+            yield montar_lote(buffers)
+            buffers = {coluna: [] for coluna in colunas}
+            quantidade = 0
+    if quantidade:
+        yield montar_lote(buffers)
+
+
+# Função para transformar os buffers de um lote em um DataFrame de strings
+# (campos vazios viram nulos, como no CSV). O texto é mantido de propósito: a
+# validação (validacao.py) confere os valores brutos, do mesmo jeito que nos CSVs.
+def montar_lote(buffers):
+    return pd.DataFrame({
+        coluna: pd.Series([None if v is None or v == '' else str(v) for v in valores], dtype='object')
+        for coluna, valores in buffers.items()
+    })
+
+
+# Função para montar o caminho de saída de um DBF no formato escolhido
+def caminho_saida(arquivo, diretorio_saida, formato):
+    if formato == 'parquet':
+        particao = particao_do_arquivo(arquivo)
+        if particao is not None:
+            return caminho_particao(diretorio_saida, *particao)
+        return os.path.join(diretorio_saida, arquivo[:-4] + '.parquet')
+    return os.path.join(diretorio_saida, arquivo[:-4] + '.csv')
+
+
+# Função para verificar se a saída já está atualizada em relação ao DBF
+def saida_atualizada(caminho_dbf, caminho_destino):
+    return os.path.exists(caminho_destino) and os.path.getmtime(caminho_destino) >= os.path.getmtime(caminho_dbf)
+
+
+# Função para converter um único DBF, lote a lote, para Parquet ou CSV. Cada lote
+# passa pela validação (validacao.py) antes de ser gravado; o relatório e a
+# quarentena do arquivo vão para <diretorio_saida>/_validacao. Devolve o total de
+# registros e o resumo da validação.
+def converter_dbf(caminho_dbf, caminho_destino, diretorio_saida, formato='parquet', tamanho_lote=TAMANHO_LOTE):
+    os.makedirs(os.path.dirname(caminho_destino), exist_ok=True)
+    nome = os.path.splitext(os.path.basename(caminho_dbf))[0]
+    particao = particao_do_arquivo(os.path.basename(caminho_dbf))
+    relatorios, quarentenas = [], []
+    # Grava em um arquivo temporário para não deixar saída parcial se a conversão falhar
+    # (oculto, prefixo '.', para o pyarrow.dataset não lê-lo como partição)
+    caminho_temporario = os.path.join(os.path.dirname(caminho_destino), '.' + os.path.basename(caminho_destino) + '.tmp')
+    total = 0
+    escritor = None
+    try:
+        try:
+            for lote in ler_dbf_em_lotes(caminho_dbf, tamanho_lote):
+                lote, relatorio, quarentena = validar_lote(lote, particao[1] if particao else None)
+                relatorios.append(relatorio)
+                quarentenas.append(quarentena)
+                if formato == 'parquet':
+                    lote = tipar_dataframe(lote.drop(columns=['contador'], errors='ignore'))
+                    tabela = pa.Table.from_pandas(lote, schema=esquema_arrow(lote.columns), preserve_index=False)
+                    if escritor is None:
+                        escritor = pq.ParquetWriter(caminho_temporario, tabela.schema, compression='zstd')
+                    escritor.write_table(tabela)
+                else:
+                    lote.to_csv(caminho_temporario, mode='w' if total == 0 else 'a', header=total == 0, index=False, encoding='utf-8')
+                total += len(lote)
+        finally:
+            if escritor is not None:
+                escritor.close()
+        if total == 0:
+            raise ValueError('arquivo DBF sem registros')
+        os.replace(caminho_temporario, caminho_destino)
+    except Exception:
+        # Descarta a saída parcial (o escritor já foi fechado) e repassa o erro
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+        raise
+    return total, gravar_validacao(diretorio_saida, nome, combinar_relatorios(relatorios), pd.concat(quarentenas, ignore_index=True))
+
+
+# Função para converter arquivos DBF (em paralelo e de forma incremental)
+def converter_dbf_para_csv(diretorio_dbf, diretorio_saida, formato='csv', trabalhadores=None,
+                           tamanho_lote=TAMANHO_LOTE, forcar=False):
+    # No dataset Parquet, o manifesto de ingestão (checksum de cada DBF) decide quais
+    # partições DN<UF><ANO> reconverter; os demais arquivos seguem a data da saída
+    pendentes = {}
+    if formato == 'parquet':
+        lista_pendentes, tocados = arquivos_pendentes(diretorio_dbf, diretorio_saida, particao_do_arquivo, '.dbf', forcar)
+        for entrada in tocados:
+            registrar_ingestao(diretorio_saida, entrada)
+        pendentes = {arquivo: entrada for arquivo, _, entrada in lista_pendentes}
+
+    tarefas = {}
+    for arquivo in sorted(os.listdir(diretorio_dbf)):
+        if not arquivo.lower().endswith('.dbf'):
+            continue
+        caminho_dbf = os.path.join(diretorio_dbf, arquivo)
+        caminho_destino = caminho_saida(arquivo, diretorio_saida, formato)
+        # Pula arquivos já convertidos (reexecução incremental)
+        if formato == 'parquet' and particao_do_arquivo(arquivo) is not None:
+            convertido = arquivo not in pendentes
+        else:
+            convertido = not forcar and saida_atualizada(caminho_dbf, caminho_destino)
+        if convertido:
+            print(f"Arquivo {arquivo} já convertido, ignorando")
+            continue
+        tarefas[arquivo] = (caminho_dbf, caminho_destino)
+
+    convertidos = []
+    with ProcessPoolExecutor(max_workers=trabalhadores) as executor:
+        futuros = {
+            executor.submit(converter_dbf, caminho_dbf, caminho_destino, diretorio_saida, formato, tamanho_lote): (arquivo, caminho_destino)
+            for arquivo, (caminho_dbf, caminho_destino) in tarefas.items()
+        }
+        for futuro in as_completed(futuros):
+            arquivo, caminho_destino = futuros[futuro]
             try:
-                # Carregar o arquivo DBF em um DataFrame
-                dbf = DBF(caminho_dbf, encoding='utf-8')
-                df = pd.DataFrame(iter(dbf))
-
-                # Salvar o DataFrame em um arquivo CSV com o mesmo nome
-                nome_csv = arquivo.replace('.dbf', '.csv')
-                caminho_csv = os.path.join(diretorio_csv, nome_csv)
-                df.to_csv(caminho_csv, index=False, encoding='utf-8')
-
-                print(f"Arquivo {arquivo} convertido com sucesso para {nome_csv}")
+                total, validacao = futuro.result()
+                convertidos.append(caminho_destino)
+                if arquivo in pendentes:
+                    registrar_ingestao(diretorio_saida, {**pendentes[arquivo], 'registros': total, 'validacao': validacao,
+                                                         'destino': os.path.relpath(caminho_destino, diretorio_saida)})
+                print(f"Arquivo {arquivo} convertido com sucesso para {caminho_destino} ({total} registros, "
+                      f"{validacao['quarentena']} em quarentena)")
             except Exception as e:
                 print(f"Erro ao converter o arquivo {arquivo}: {e}")
-
-# Executar a função de conversão
-converter_dbf_para_csv(diretorio_dbf, diretorio_csv)
+    return convertidos
+
+
+# Executar a função de conversão (o guarda é necessário para o ProcessPoolExecutor)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converte os arquivos DBF do SINASC para CSV ou Parquet.')
+    parser.add_argument('--dbf', default=diretorio_dbf)
+    parser.add_argument('--saida', default=None, help='Diretório de saída (padrão: Dados_csv ou Dados_parquet)')
+    parser.add_argument('--formato', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--trabalhadores', type=int, default=None, help='Processos em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Registros por lote')
+    parser.add_argument('--forcar', action='store_true', help='Reconverte mesmo os arquivos atualizados')
+    args = parser.parse_args()
+
+    diretorio_saida = args.saida or (diretorio_csv if args.formato == 'csv' else os.path.join(os.getcwd(), 'Dados_parquet'))
+    os.makedirs(diretorio_saida, exist_ok=True)
+    convertidos = converter_dbf_para_csv(args.dbf, diretorio_saida, args.formato, args.trabalhadores, args.lote, args.forcar)
+
+    # Ao gravar direto no dataset Parquet, atualiza também o cubo de agregados
+    if args.formato == 'parquet' and convertidos:
+        atualizar_cubo(diretorio_saida)
 
 
 # Configuração da interface
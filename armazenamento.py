@@ -0,0 +1,270 @@
+import os
+import re
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from cubo import ARQUIVO_CUBO, COLUNAS_CUBO, combinar_cubos, construir_cubo, ler_cubo, salvar_cubo
+from manifesto import arquivos_pendentes, registrar_ingestao
+from ufs import CODIGOS_UF
+from validacao import gravar_validacao, validar_lote
+
+# Colunas efetivamente usadas pelo dashboard (BPN-AV3.py)
+COLUNAS_DASHBOARD = ['UF', 'DTNASC', 'PESO', 'IDADEMAE', 'CODMUNNASC', 'CODMUNRES']
+
+# Tipos de leitura dos CSVs: tudo que é código fica como string para não perder
+# zeros à esquerda (ex.: DTNASC '01012000', QTDFILVIVO '06')
+DTYPES_CSV = {
+    'IDADEMAE': 'float64',
+    'CODMUNNASC': 'str',
+    'CODMUNRES': 'str',
+    'DTNASC': 'str',
+    'PESO': 'str',
+}
+
+# Esquema tipado do dataset colunar (as demais colunas são gravadas como string)
+ESQUEMA_TIPADO = {
+    'DTNASC': pa.date32(),
+    'PESO': pa.float32(),
+    'IDADEMAE': pa.float32(),
+    'CODMUNNASC': pa.string(),
+    'CODMUNRES': pa.string(),
+}
+
+# Registros por lote nas leituras fora da memória (out-of-core) do dataset
+TAMANHO_LOTE_LEITURA = 1_000_000
+
+# Padrão dos arquivos do SINASC: DN + UF + ANO (ex.: DNPB2000.csv, DNPB2000.dbf)
+PADRAO_ARQUIVO = re.compile(r'^DN([A-Z]{2})(\d{4})\.(csv|dbf)$', re.IGNORECASE)
+
+
+# Função para extrair UF e ano do nome do arquivo. Siglas fora da tabela de UFs
+# (ex.: DNEX2000.csv) não são partições: os dois motores de consulta veem as mesmas UFs.
+def particao_do_arquivo(arquivo):
+    correspondencia = PADRAO_ARQUIVO.match(arquivo)
+    if correspondencia is None or correspondencia.group(1).upper() not in CODIGOS_UF:
+        return None
+    return correspondencia.group(1).upper(), int(correspondencia.group(2))
+
+
+# Função para ler um CSV do SINASC como strings (campos vazios viram nulos)
+def ler_csv_bruto(caminho_csv, colunas=None):
+    df = pd.read_csv(caminho_csv, dtype=str, usecols=colunas, keep_default_na=False, na_values=[''])
+    return df.drop(columns=['contador'], errors='ignore')
+
+
+# Função para ler um CSV do SINASC já com os tipos corretos
+def ler_csv_tipado(caminho_csv, colunas=None):
+    return tipar_dataframe(ler_csv_bruto(caminho_csv, colunas))
+
+
+# Função para converter as colunas tipadas de um DataFrame de strings;
+# o restante permanece como string
+def tipar_dataframe(df):
+    if 'DTNASC' in df:
+        df['DTNASC'] = pd.to_datetime(df['DTNASC'].str.zfill(8), format='%d%m%Y', errors='coerce').dt.date
+    if 'PESO' in df:
+        df['PESO'] = pd.to_numeric(df['PESO'].str.replace(',', '.').str.strip(), errors='coerce').astype('float32')
+    if 'IDADEMAE' in df:
+        df['IDADEMAE'] = pd.to_numeric(df['IDADEMAE'], errors='coerce').astype('float32')
+    return df
+
+
+# Função para montar o esquema Arrow de um DataFrame lido do CSV
+def esquema_arrow(colunas):
+    return pa.schema([(coluna, ESQUEMA_TIPADO.get(coluna, pa.string())) for coluna in colunas])
+
+
+# Função para montar o caminho do arquivo Parquet de uma partição UF/ANO
+def caminho_particao(diretorio_parquet, uf, ano):
+    return os.path.join(diretorio_parquet, f'UF={uf}', f'ANO={ano}', 'part-0.parquet')
+
+
+# Função para converter os CSVs em um dataset Parquet particionado por UF/ANO.
+# A ingestão é incremental: o manifesto (manifesto.py) guarda o checksum de cada
+# CSV já ingerido, e só os arquivos novos ou alterados são relidos e gravados.
+# Com forcar=True todos são reprocessados. Cada CSV passa pela validação
+# (validacao.py): relatório e quarentena ficam em <diretorio_parquet>/_validacao.
+def ingerir_csv_para_parquet(diretorio_csv, diretorio_parquet, forcar=False):
+    gerados = []
+    pendentes, tocados = arquivos_pendentes(diretorio_csv, diretorio_parquet, particao_do_arquivo, '.csv', forcar)
+    for entrada in tocados:
+        registrar_ingestao(diretorio_parquet, entrada)
+    for arquivo, caminho_csv, entrada in pendentes:
+        df, relatorio, quarentena = validar_lote(ler_csv_bruto(caminho_csv), entrada['ano'])
+        validacao = gravar_validacao(diretorio_parquet, os.path.splitext(arquivo)[0], relatorio, quarentena)
+        df = tipar_dataframe(df)
+        tabela = pa.Table.from_pandas(df, schema=esquema_arrow(df.columns), preserve_index=False)
+
+        # Grava em um arquivo temporário (oculto para o pyarrow.dataset, prefixo '.')
+        # para não deixar partição parcial se falhar
+        caminho_parquet = caminho_particao(diretorio_parquet, entrada['uf'], entrada['ano'])
+        caminho_temporario = os.path.join(os.path.dirname(caminho_parquet), '.part-0.parquet.tmp')
+        os.makedirs(os.path.dirname(caminho_parquet), exist_ok=True)
+        pq.write_table(tabela, caminho_temporario, compression='zstd')
+        os.replace(caminho_temporario, caminho_parquet)
+        registrar_ingestao(diretorio_parquet, {**entrada, 'registros': tabela.num_rows, 'validacao': validacao,
+                                               'destino': os.path.relpath(caminho_parquet, diretorio_parquet)})
+        gerados.append(caminho_parquet)
+        print(f'Arquivo {arquivo} gravado em {caminho_parquet} ({tabela.num_rows} registros, {validacao["quarentena"]} em quarentena)')
+
+    if gerados or (dataset_disponivel(diretorio_parquet) and ler_cubo(diretorio_parquet) is None):
+        atualizar_cubo(diretorio_parquet)
+    return gerados
+
+
+# Função para listar as partições (uf, ano, diretório) gravadas no dataset
+def particoes_dataset(diretorio_parquet):
+    particoes = []
+    if not os.path.isdir(diretorio_parquet):
+        return particoes
+    for nome_uf in sorted(os.listdir(diretorio_parquet)):
+        if not nome_uf.startswith('UF=') or nome_uf[3:] not in CODIGOS_UF:
+            continue
+        for nome_ano in sorted(os.listdir(os.path.join(diretorio_parquet, nome_uf))):
+            diretorio = os.path.join(diretorio_parquet, nome_uf, nome_ano)
+            if nome_ano.startswith('ANO=') and os.path.exists(os.path.join(diretorio, 'part-0.parquet')):
+                particoes.append((nome_uf[3:], int(nome_ano[4:]), diretorio))
+    return particoes
+
+
+# Função para montar o cubo de uma partição UF/ANO. Só os arquivos dela são lidos
+# (o filtro poda as demais) e em lotes, então a memória fica limitada ao lote.
+def construir_cubo_particao(diretorio_parquet, uf, ano, tamanho_lote=TAMANHO_LOTE_LEITURA):
+    dataset = abrir_dataset(diretorio_parquet)
+    lotes = dataset.to_batches(columns=COLUNAS_CUBO, filter=filtro_dataset(ufs=[uf], anos=[ano]), batch_size=tamanho_lote)
+    return combinar_cubos(
+        construir_cubo(lote.to_pandas(strings_to_categorical=True, date_as_object=False))
+        for lote in lotes
+    )
+
+
+# Função para atualizar o cubo de contagens do dataset Parquet. Cada partição tem
+# o seu cubo parcial ao lado dos dados (_cubo.parquet); só os ausentes ou mais velhos
+# que a partição são remontados, e o cubo geral é a soma dos parciais. Assim, uma
+# partição nova ou alterada custa só a leitura dela.
+def atualizar_cubo(diretorio_parquet, tamanho_lote=TAMANHO_LOTE_LEITURA):
+    parciais = []
+    for uf, ano, diretorio in particoes_dataset(diretorio_parquet):
+        caminho_cubo = os.path.join(diretorio, ARQUIVO_CUBO)
+        if os.path.exists(caminho_cubo) and os.path.getmtime(caminho_cubo) >= os.path.getmtime(os.path.join(diretorio, 'part-0.parquet')):
+            parciais.append(ler_cubo(diretorio))
+            continue
+        cubo_particao = construir_cubo_particao(diretorio_parquet, uf, ano, tamanho_lote)
+        if cubo_particao is not None:
+            salvar_cubo(cubo_particao, diretorio)
+        parciais.append(cubo_particao)
+    cubo = combinar_cubos(parciais)
+    if cubo is None:
+        return None
+    caminho = salvar_cubo(cubo, diretorio_parquet)
+    print(f'Cubo de agregados gravado em {caminho} ({len(cubo)} células)')
+    return cubo
+
+
+# Função para abrir o dataset Parquet (com memory-map dos arquivos locais)
+def abrir_dataset(diretorio_parquet):
+    return ds.dataset(
+        diretorio_parquet,
+        format='parquet',
+        partitioning='hive',
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+# Função para verificar se o dataset Parquet existe e tem arquivos
+def dataset_disponivel(diretorio_parquet):
+    if not os.path.isdir(diretorio_parquet):
+        return False
+    return any(arquivo.endswith('.parquet') for _, _, arquivos in os.walk(diretorio_parquet) for arquivo in arquivos)
+
+
+# Função para gerar a assinatura (caminho, mtime, tamanho) dos arquivos de origem.
+# Diretórios são percorridos recursivamente; caminhos inexistentes entram com None,
+# assim a assinatura muda quando o arquivo/diretório aparece.
+def assinatura_arquivos(*caminhos):
+    assinatura = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, _, arquivos in sorted(os.walk(caminho)):
+                for arquivo in sorted(arquivos):
+                    info = os.stat(os.path.join(raiz, arquivo))
+                    assinatura.append((os.path.join(raiz, arquivo), info.st_mtime_ns, info.st_size))
+        elif os.path.exists(caminho):
+            info = os.stat(caminho)
+            assinatura.append((caminho, info.st_mtime_ns, info.st_size))
+        else:
+            assinatura.append((caminho, None, None))
+    return tuple(assinatura)
+
+
+# Função para listar as UFs disponíveis (partições do dataset Parquet ou nomes dos CSVs)
+def ufs_disponiveis(diretorio_parquet, diretorio_csv):
+    ufs = set()
+    if os.path.isdir(diretorio_parquet):
+        ufs.update(nome[3:] for nome in os.listdir(diretorio_parquet) if nome.startswith('UF=') and nome[3:] in CODIGOS_UF)
+    if not ufs and os.path.isdir(diretorio_csv):
+        ufs.update(particao[0] for particao in map(particao_do_arquivo, os.listdir(diretorio_csv)) if particao)
+    return sorted(ufs)
+
+
+# Função para montar o filtro do dataset (empurrado para a leitura: partições
+# UF/ANO fora do filtro nem são abertas, e CODMUNNASC usa as estatísticas do Parquet)
+def filtro_dataset(ufs=None, anos=None, municipios=None):
+    filtro = None
+    condicoes = []
+    if ufs:
+        condicoes.append(ds.field('UF').isin(list(ufs)))
+    if anos:
+        condicoes.append(ds.field('ANO').isin([int(ano) for ano in anos]))
+    if municipios:
+        condicoes.append(ds.field('CODMUNNASC').isin([str(codigo) for codigo in municipios]))
+    for condicao in condicoes:
+        filtro = condicao if filtro is None else filtro & condicao
+    return filtro
+
+
+# Função para carregar só as colunas necessárias do dataset Parquet
+def carregar_parquet(diretorio_parquet, colunas=COLUNAS_DASHBOARD, filtro=None):
+    dataset = abrir_dataset(diretorio_parquet)
+    colunas = [coluna for coluna in colunas if coluna in dataset.schema.names]
+    tabela = dataset.to_table(columns=colunas, filter=filtro)
+    # split_blocks/self_destruct evitam a cópia intermediária na conversão para pandas;
+    # códigos em string viram categorias direto do dicionário do Arrow
+    return tabela.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False, strings_to_categorical=True)
+
+
+# Função para ler, em lotes, as colunas pedidas dos registros das UFs: do dataset
+# Parquet (filtro por UF empurrado para a leitura; códigos em string viram categorias)
+# ou, sem ele, dos CSVs DN<UF><ANO> das UFs, com a coluna UF vinda do nome do arquivo.
+# tamanho_lote=None lê cada CSV de uma vez.
+def lotes_por_uf(ufs, colunas, diretorio_parquet, diretorio_csv, tamanho_lote=TAMANHO_LOTE_LEITURA, dtype=str):
+    if diretorio_parquet is not None and dataset_disponivel(diretorio_parquet):
+        dataset = abrir_dataset(diretorio_parquet)
+        presentes = [coluna for coluna in colunas if coluna in dataset.schema.names]
+        for lote in dataset.to_batches(columns=presentes, filter=filtro_dataset(ufs=ufs),
+                                       batch_size=tamanho_lote or TAMANHO_LOTE_LEITURA):
+            yield lote.to_pandas(date_as_object=False, strings_to_categorical=True)
+        return
+
+    for arquivo in sorted(os.listdir(diretorio_csv)):
+        particao = particao_do_arquivo(arquivo)
+        if particao is None or particao[0] not in ufs or not arquivo.lower().endswith('.csv'):
+            continue
+        lotes = pd.read_csv(os.path.join(diretorio_csv, arquivo), dtype=dtype, chunksize=tamanho_lote,
+                            usecols=lambda coluna: coluna in colunas)
+        for lote in ([lotes] if tamanho_lote is None else lotes):
+            if 'UF' in colunas:
+                lote['UF'] = particao[0]
+            yield lote
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Converte os CSVs do SINASC em um dataset Parquet particionado por UF/ANO.')
+    parser.add_argument('--csv', default=os.path.join(os.getcwd(), 'Dados_csv'))
+    parser.add_argument('--parquet', default=os.path.join(os.getcwd(), 'Dados_parquet'))
+    parser.add_argument('--forcar', action='store_true', help='Reprocessa todos os CSVs, mesmo os já ingeridos')
+    args = parser.parse_args()
+    ingerir_csv_para_parquet(args.csv, args.parquet, args.forcar)
@@ -0,0 +1,308 @@
+import os
+import gc
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# resource só existe em sistemas POSIX (no Windows o RSS máximo fica nulo)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import graficos
+import processamento
+from armazenamento import COLUNAS_DASHBOARD, DTYPES_CSV, carregar_parquet, esquema_arrow, tipar_dataframe
+from codificacao import COLUNAS_CODIGOS, DTYPES_CODIGOS_CSV, codificar_codigos
+from cubo import construir_cubo, nascimentos_por_ano_cubo, restringir_ufs, taxa_por_municipio_cubo
+from geometria import NIVEL_PADRAO, TOLERANCIAS, caminho_shapefile_uf, montar_geojson, simplificar_geometrias
+from instrumentacao import rss_atual
+
+# Benchmark headless (sem navegador e sem Streamlit) do pipeline do dashboard:
+# carga → pré-processamento → nomes dos municípios → métricas → agregações → figuras.
+# Os dados são sintéticos, com distribuições próximas às do SINASC da Paraíba.
+
+# Arquivo onde os resultados são acumulados (um JSON por linha, com o commit)
+arquivo_resultados = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'resultados.jsonl')
+
+# Tamanhos padrão (número de registros)
+TAMANHOS_PADRAO = [10**5, 10**6, 10**7]
+
+# Registros gerados por bloco (limita a memória da geração)
+TAMANHO_BLOCO = 10**6
+
+# Quantidade de municípios da Paraíba
+QUANTIDADE_MUNICIPIOS = 223
+
+# Piora relativa a partir da qual uma etapa é marcada como regressão
+LIMIAR_REGRESSAO = 0.20
+
+
+# Função para gerar os códigos sintéticos dos municípios da UF
+def codigos_municipios(prefixo='25', quantidade=QUANTIDADE_MUNICIPIOS):
+    return np.array([f'{prefixo}{10000 + 73 * i:05d}' for i in range(quantidade)])
+
+
+# Função para gerar um bloco de registros sintéticos do SINASC (colunas como strings,
+# como saem do DBF/CSV)
+def gerar_bloco_sinasc(n, rng, anos=(2000, 2020)):
+    municipios = codigos_municipios()
+    # Poucos municípios concentram os partos (capital e polos regionais)
+    pesos_municipios = 1.0 / np.arange(1, len(municipios) + 1) ** 1.1
+    pesos_municipios /= pesos_municipios.sum()
+    outros_estados = np.array(['2611606', '2408102', '2927408', '2304400'])
+
+    codmunnasc = rng.choice(municipios, n, p=pesos_municipios).astype(object)
+    fora = rng.random(n) < 0.03
+    codmunnasc[fora] = rng.choice(outros_estados, fora.sum())
+    codmunres = np.where(rng.random(n) < 0.7, codmunnasc, rng.choice(municipios, n)).astype(object)
+
+    # Peso: mistura de termo (~92%) e pré-termo (~8%), com nulos e zeros ocasionais
+    pre_termo = rng.random(n) < 0.08
+    peso = np.where(pre_termo, rng.normal(1900, 450, n), rng.normal(3250, 450, n)).clip(300, 6000).round()
+    peso_str = peso.astype(int).astype(str).astype(object)
+    peso_str[rng.random(n) < 0.015] = None
+    peso_str[rng.random(n) < 0.002] = '0'
+
+    # Idade da mãe: ~N(25, 6.5), com nulos e o código 99 (ignorado)
+    idade = rng.normal(25, 6.5, n).clip(12, 50).round().astype(int).astype(str).astype(object)
+    idade[rng.random(n) < 0.02] = None
+    idade[rng.random(n) < 0.003] = '99'
+
+    # Data de nascimento no formato DDMMAAAA
+    inicio = np.datetime64(f'{anos[0]}-01-01')
+    dias = (np.datetime64(f'{anos[1] + 1}-01-01') - inicio).astype(int)
+    datas = pd.to_datetime(inicio + rng.integers(0, dias, n).astype('timedelta64[D]'))
+    dtnasc = datas.strftime('%d%m%Y').to_numpy(dtype=object)
+
+    def codigo(valores, n_nulos=0.02, largura=1):
+        serie = np.char.zfill(rng.choice(valores, n).astype(str), largura).astype(object)
+        serie[rng.random(n) < n_nulos] = None
+        return serie
+
+    return pd.DataFrame({
+        'LOCNASC': codigo([1, 1, 1, 2, 3, 4], 0),
+        'CODMUNNASC': codmunnasc,
+        'IDADEMAE': idade,
+        'ESTCIVMAE': codigo([1, 2, 3, 4, 5, 9]),
+        'ESCMAE': codigo([1, 2, 3, 4, 5, 9], 0.04),
+        'QTDFILVIVO': codigo(range(0, 8), 0.12, 2),
+        'QTDFILMORT': codigo(range(0, 3), 0.23, 2),
+        'CODMUNRES': codmunres,
+        'GESTACAO': codigo([1, 2, 3, 4, 5, 5, 5, 6], 0.01),
+        'GRAVIDEZ': codigo([1] * 30 + [2, 3], 0.005),
+        'PARTO': codigo([1, 2], 0.005),
+        'CONSULTAS': codigo([1, 2, 3, 4, 4], 0.02),
+        'DTNASC': dtnasc,
+        'SEXO': codigo([1, 2], 0),
+        'APGAR1': codigo(range(0, 11), 0.13, 2),
+        'APGAR5': codigo(range(0, 11), 0.19, 2),
+        'RACACOR': codigo([1, 2, 3, 4, 5], 0.13),
+        'PESO': peso_str,
+    })
+
+
+# Função para gravar o dataset sintético em CSV e em Parquet (particionado UF/ANO
+# como o do armazenamento.py), bloco a bloco
+def gerar_dataset_sintetico(n, diretorio, semente=0):
+    rng = np.random.default_rng(semente)
+    caminho_csv = os.path.join(diretorio, 'DNPB_sintetico.csv')
+    diretorio_parquet = os.path.join(diretorio, 'parquet')
+    caminho_parquet = os.path.join(diretorio_parquet, 'UF=PB', 'part-0.parquet')
+    os.makedirs(os.path.dirname(caminho_parquet), exist_ok=True)
+
+    escritor = None
+    gerados = 0
+    while gerados < n:
+        bloco = gerar_bloco_sinasc(min(TAMANHO_BLOCO, n - gerados), rng)
+        bloco.to_csv(caminho_csv, mode='w' if gerados == 0 else 'a', header=gerados == 0, index=False)
+        tipado = tipar_dataframe(bloco)
+        tabela = pa.Table.from_pandas(tipado, schema=esquema_arrow(tipado.columns), preserve_index=False)
+        if escritor is None:
+            escritor = pq.ParquetWriter(caminho_parquet, tabela.schema, compression='zstd')
+        escritor.write_table(tabela)
+        gerados += len(bloco)
+    escritor.close()
+    return caminho_csv, diretorio_parquet
+
+
+# Função para montar o GeoJSON usado no mapa: polígonos reais do shapefile da
+# Paraíba quando disponível, senão uma grade de quadrados; códigos sintéticos
+def geojson_sintetico():
+    import geopandas as gpd
+    import shapely
+
+    municipios = codigos_municipios()
+    caminho = caminho_shapefile_uf('PB')
+    if os.path.exists(caminho):
+        geometrias = gpd.read_file(caminho).to_crs(4326).geometry.values[:len(municipios)]
+    else:
+        lado = int(np.ceil(np.sqrt(len(municipios))))
+        geometrias = np.array([shapely.box(-38 + 0.1 * (i % lado), -8 + 0.1 * (i // lado),
+                                           -37.9 + 0.1 * (i % lado), -7.9 + 0.1 * (i // lado))
+                               for i in range(len(municipios))])
+    gdf = pd.DataFrame({'CD_MUN': municipios[:len(geometrias)], 'NM_MUN': [f'Município {c}' for c in municipios[:len(geometrias)]]})
+    return montar_geojson(gdf, simplificar_geometrias(geometrias, TOLERANCIAS[NIVEL_PADRAO]))
+
+
+# Monitor do pico de RSS durante uma etapa: uma thread amostra o RSS a cada
+# poucos milissegundos. Diferente do tracemalloc, inclui os buffers do Arrow e
+# quase não pesa no tempo medido.
+class MonitorMemoria:
+    def __init__(self, intervalo=0.005):
+        self.intervalo = intervalo
+        self.inicial = self.pico = rss_atual()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico = max(self.pico, rss_atual())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, rss_atual())
+
+    @property
+    def pico_incremental(self):
+        return self.pico - self.inicial
+
+
+# Função para medir uma etapa: tempo de parede, pico de memória da etapa (acima
+# do RSS do início dela) e RSS máximo do processo (nulo sem o módulo resource).
+# Sem /proc, o pico vem do tracemalloc, que não vê os buffers do Arrow e deixa a
+# etapa mais lenta.
+def medir(nome, funcao, resultados):
+    gc.collect()
+    if rss_atual() is not None:
+        with MonitorMemoria() as monitor:
+            inicio = time.perf_counter()
+            retorno = funcao()
+            segundos = time.perf_counter() - inicio
+        pico = monitor.pico_incremental
+    else:
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        retorno = funcao()
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    resultados.append({
+        'etapa': nome,
+        'segundos': round(segundos, 4),
+        'pico_mb': round(pico / 2**20, 1),
+        'rss_max_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource is not None else None,
+    })
+    print(f"  {nome:<26} {segundos:9.3f} s {pico / 2**20:10.1f} MB")
+    return retorno
+
+
+# Função para rodar todas as etapas do pipeline para um tamanho de dataset
+def executar_pipeline(n, diretorio, geojson):
+    print(f'Gerando {n} registros sintéticos...')
+    caminho_csv, diretorio_parquet = gerar_dataset_sintetico(n, diretorio)
+
+    resultados = []
+    print(f'Pipeline com {n} registros:')
+    medir('load_data_csv', lambda: pd.read_csv(
+        caminho_csv, dtype=DTYPES_CSV, usecols=lambda coluna: coluna in COLUNAS_DASHBOARD), resultados)
+    # O dataset Parquet é o caminho principal do app; o CSV fica só como referência
+    df_total = medir('load_data_parquet', lambda: carregar_parquet(diretorio_parquet, COLUNAS_DASHBOARD), resultados)
+    df_baixo_peso = medir('preprocess_data', lambda: processamento.preprocess_data(df_total), resultados)
+
+    # Colunas de códigos do SINASC: leitura padrão do pandas (int64/float64) x
+    # codificação compacta (codificacao.py, categorias de 1 byte)
+    medir('load_codigos_csv_padrao', lambda: pd.read_csv(caminho_csv, usecols=COLUNAS_CODIGOS), resultados)
+    medir('load_codigos_csv_codificado', lambda: codificar_codigos(
+        pd.read_csv(caminho_csv, dtype=DTYPES_CODIGOS_CSV, usecols=COLUNAS_CODIGOS)), resultados)
+
+    municipios_mapping = pd.DataFrame({
+        'CODMUNNASC': [feature['id'] for feature in geojson['features']],
+        'Nome_Municipio': [feature['properties']['NM_MUN'] for feature in geojson['features']],
+    })
+    medir('merge_municipios', lambda: (processamento.adicionar_nome_municipio(df_total, municipios_mapping),
+                                       processamento.adicionar_nome_municipio(df_baixo_peso, municipios_mapping)), resultados)
+    medir('calculate_metrics', lambda: processamento.calculate_metrics(df_total, df_baixo_peso), resultados)
+
+    cubo = medir('construir_cubo', lambda: restringir_ufs(construir_cubo(df_total), ['PB']), resultados)
+    df_combined = medir('nascimentos_por_ano', lambda: nascimentos_por_ano_cubo(cubo), resultados)
+    medir('figura_nascimentos_por_ano', lambda: graficos.figura_nascimentos_por_ano(df_combined).to_json(), resultados)
+    merged = medir('taxa_por_municipio', lambda: taxa_por_municipio_cubo(cubo), resultados)
+    medir('figura_mapa', lambda: graficos.figura_mapa(graficos.dados_mapa(geojson, merged), geojson, 'Benchmark').to_json(), resultados)
+    return resultados
+
+
+# Função para obter o commit atual (para comparar resultados entre commits). Com
+# arquivos rastreados alterados, a medição não é a do commit: leva o sufixo '-dirty'
+# (como no git describe --dirty) e não se confunde com a execução do commit limpo.
+def commit_atual():
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=diretorio, check=True).stdout.strip()
+        alterados = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                                   text=True, cwd=diretorio, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if alterados else commit
+
+
+# Função para acrescentar os resultados de uma execução ao arquivo de resultados
+def salvar_resultados(resultados, n, commit, caminho=arquivo_resultados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    data = datetime.now().isoformat(timespec='seconds')
+    with open(caminho, 'a', encoding='utf-8') as arquivo:
+        for resultado in resultados:
+            arquivo.write(json.dumps({'commit': commit, 'data': data, 'tamanho': n, **resultado}) + '\n')
+
+
+# Função para comparar os resultados de um commit com a última execução de outro commit
+def comparar_resultados(commit, caminho=arquivo_resultados):
+    if not os.path.exists(caminho):
+        return
+    historico = pd.read_json(caminho, lines=True)
+    atual = historico[historico['commit'] == commit].groupby(['tamanho', 'etapa']).last()
+    anteriores = historico[historico['commit'] != commit]
+    if atual.empty or anteriores.empty:
+        return
+    anterior = anteriores.groupby(['tamanho', 'etapa']).last()
+    comparacao = atual[['segundos']].join(anterior[['segundos', 'commit']], rsuffix='_anterior', how='inner')
+    if comparacao.empty:
+        return
+    comparacao['variacao'] = comparacao['segundos'] / comparacao['segundos_anterior'] - 1
+    comparacao['regressao'] = comparacao['variacao'] > LIMIAR_REGRESSAO
+    print('\nComparação com a execução anterior:')
+    print(comparacao.to_string(formatters={'variacao': '{:+.0%}'.format}))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark headless do pipeline do dashboard com dados sintéticos do SINASC.')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO, help='Quantidades de registros')
+    parser.add_argument('--nao-salvar', action='store_true', help='Não grava em benchmarks/resultados.jsonl')
+    args = parser.parse_args()
+
+    commit = commit_atual()
+    geojson = geojson_sintetico()
+    graficos.figura_nascimentos_por_ano(pd.DataFrame({'Ano': [2000], 'Total_Nascimentos': [1], 'Total_Baixo_Peso': [0]})).to_json()  # Aquece o Plotly
+    for n in args.tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            resultados = executar_pipeline(n, diretorio, geojson)
+        if not args.nao_salvar:
+            salvar_resultados(resultados, n, commit)
+        gc.collect()
+    if not args.nao_salvar:
+        comparar_resultados(commit)
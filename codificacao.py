@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from validacao import REGRAS
+
+# Codificação compacta das colunas de códigos do SINASC. Cada coluna vira uma
+# categoria com um tipo fixo (TIPOS_CODIGOS): as categorias são os códigos do
+# dicionário do SINASC, os mesmos em todos os anos e UFs, e cada registro guarda só
+# o código da categoria em 1 byte (int8; -1 = nulo). Comparado às strings (object)
+# ou ao int64/float64 do read_csv, cai de 8 a ~60 bytes para 1 byte por valor. Como
+# o tipo é o mesmo objeto em todos os arquivos, o pd.concat dos anos só junta os
+# arrays de códigos, sem unir categorias nem recodificar. Os rótulos (ex.: SEXO
+# 1 → Masculino) só são aplicados na exibição (decodificar), trocando as categorias
+# e não os registros.
+
+# Rótulos dos códigos de cada coluna (dicionário de dados do SINASC)
+ROTULOS = {
+    'LOCNASC': {1: 'Hospital', 2: 'Outro estabelecimento de saúde', 3: 'Domicílio', 4: 'Outros',
+                5: 'Aldeia indígena', 9: 'Ignorado'},
+    'ESTCIVMAE': {1: 'Solteira', 2: 'Casada', 3: 'Viúva', 4: 'Separada judicialmente/divorciada',
+                  5: 'União estável', 9: 'Ignorado'},
+    'ESCMAE': {1: 'Nenhuma', 2: '1 a 3 anos', 3: '4 a 7 anos', 4: '8 a 11 anos', 5: '12 anos e mais', 9: 'Ignorado'},
+    'GESTACAO': {1: 'Menos de 22 semanas', 2: '22 a 27 semanas', 3: '28 a 31 semanas', 4: '32 a 36 semanas',
+                 5: '37 a 41 semanas', 6: '42 semanas e mais', 9: 'Ignorado'},
+    'GRAVIDEZ': {1: 'Única', 2: 'Dupla', 3: 'Tripla e mais', 9: 'Ignorado'},
+    'PARTO': {1: 'Vaginal', 2: 'Cesário', 9: 'Ignorado'},
+    'CONSULTAS': {1: 'Nenhuma', 2: 'De 1 a 3', 3: 'De 4 a 6', 4: '7 e mais', 9: 'Ignorado'},
+    'SEXO': {0: 'Não informado', 1: 'Masculino', 2: 'Feminino', 9: 'Ignorado'},
+    'RACACOR': {1: 'Branca', 2: 'Preta', 3: 'Amarela', 4: 'Parda', 5: 'Indígena', 9: 'Ignorado'},
+    # Apgar: a nota é o próprio rótulo (99 = ignorado fica nulo, como na validação)
+    'APGAR1': {nota: str(nota) for nota in range(REGRAS['APGAR1']['faixa'][0], REGRAS['APGAR1']['faixa'][1] + 1)},
+    'APGAR5': {nota: str(nota) for nota in range(REGRAS['APGAR5']['faixa'][0], REGRAS['APGAR5']['faixa'][1] + 1)},
+}
+
+# Colunas codificadas
+COLUNAS_CODIGOS = list(ROTULOS)
+
+# Tipo de cada coluna, compartilhado por todos os DataFrames (mesmas categorias)
+TIPOS_CODIGOS = {coluna: pd.CategoricalDtype(sorted(rotulos)) for coluna, rotulos in ROTULOS.items()}
+
+# Tipos de leitura dessas colunas nos CSVs: categoria, sem uma string por registro
+# (codificar_coluna só converte as categorias do arquivo)
+DTYPES_CODIGOS_CSV = {coluna: 'category' for coluna in COLUNAS_CODIGOS}
+
+
+# Função para codificar uma coluna de códigos (strings como '01' ou ' 1', números ou
+# categorias) no tipo compartilhado. Só os valores distintos são convertidos;
+# códigos fora do dicionário viram nulos. Colunas já codificadas voltam como estão.
+def codificar_coluna(serie, coluna):
+    tipo = TIPOS_CODIGOS[coluna]
+    if serie.dtype == tipo:
+        return serie
+    codigos, unicos = pd.factorize(serie)
+    numeros = pd.to_numeric(pd.Series(np.asarray(unicos, dtype=object)).astype(str).str.strip(), errors='coerce')
+    posicoes = np.append(tipo.categories.get_indexer(numeros.to_numpy(dtype='float64')), -1).astype('int8')
+    return pd.Series(pd.Categorical.from_codes(posicoes[codigos], dtype=tipo), index=serie.index, name=serie.name)
+
+
+# Função para codificar, in-place, as colunas de códigos presentes no DataFrame
+def codificar_codigos(df):
+    for coluna in COLUNAS_CODIGOS:
+        if coluna in df:
+            df[coluna] = codificar_coluna(df[coluna], coluna)
+    return df
+
+
+# Função para trocar os códigos pelos rótulos, só no que vai ser exibido (uma coluna
+# ou as colunas codificadas de um DataFrame). Custa o número de categorias, não o de
+# registros: os códigos de cada linha não são tocados.
+def decodificar(dados):
+    if isinstance(dados, pd.Series):
+        return dados.cat.rename_categories(ROTULOS[dados.name]) if dados.dtype == TIPOS_CODIGOS.get(dados.name) else dados
+    return dados.assign(**{coluna: decodificar(dados[coluna]) for coluna in COLUNAS_CODIGOS if coluna in dados})
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Comparação entre N municípios sobre o cubo de agregados (cubo.py).
+# O índice ordena as células do cubo por município uma única vez e guarda o início
+# de cada grupo (offsets), então cada comparação só toca as células dos municípios
+# selecionados, em vez de varrer todos os nascimentos a cada render.
+
+
+# Índice município → faixa de células do cubo ordenado
+class IndiceMunicipios:
+    def __init__(self, cubo):
+        codigos = cubo['CODMUNNASC'].astype('category')
+        codigos_categoria = codigos.cat.codes.to_numpy()
+        ordem = np.argsort(codigos_categoria, kind='stable')
+
+        # Códigos nulos (-1) ficam no começo da ordem e fora do índice
+        nulos = int((codigos_categoria < 0).sum())
+        contagens = np.bincount(codigos_categoria[codigos_categoria >= 0], minlength=len(codigos.cat.categories))
+        self.cubo = cubo.iloc[ordem[nulos:]].reset_index(drop=True)
+        self.inicios = np.concatenate([[0], np.cumsum(contagens)])
+        self.posicoes = {str(codigo): i for i, codigo in enumerate(codigos.cat.categories) if contagens[i]}
+
+    # Códigos dos municípios presentes no índice
+    def municipios(self):
+        return list(self.posicoes)
+
+    # Células do cubo de um município (fatia contígua, sem cópia)
+    def celulas(self, codigo):
+        posicao = self.posicoes.get(str(codigo))
+        if posicao is None:
+            return self.cubo.iloc[0:0]
+        return self.cubo.iloc[self.inicios[posicao]:self.inicios[posicao + 1]]
+
+    # Células de vários municípios, na ordem pedida
+    def celulas_de(self, codigos):
+        return pd.concat([self.celulas(codigo) for codigo in codigos], ignore_index=True)
+
+
+# Função para calcular nascimentos, baixo peso e taxa de cada município selecionado
+def comparar_municipios(indice, codigos):
+    linhas = []
+    for codigo in codigos:
+        celulas = indice.celulas(codigo)
+        total = int(celulas['N'].sum())
+        baixo_peso = int(celulas.loc[celulas['BAIXO_PESO'], 'N'].sum())
+        linhas.append({
+            'CODMUNNASC': str(codigo),
+            'Nascimentos Abaixo do Peso': baixo_peso,
+            'Total de Nascimentos': total,
+            'Taxa de Nascimento Abaixo do Peso (%)': (baixo_peso / total) * 100 if total else np.nan,
+        })
+    return pd.DataFrame(linhas, columns=['CODMUNNASC', 'Nascimentos Abaixo do Peso', 'Total de Nascimentos',
+                                         'Taxa de Nascimento Abaixo do Peso (%)'])
+
+
+# Função para detalhar a comparação por ano (uma linha por município e ano, na
+# ordem dos municípios selecionados)
+def comparar_municipios_por_ano(indice, codigos):
+    codigos = [str(codigo) for codigo in codigos]
+    celulas = indice.celulas_de(codigos)
+    celulas = celulas[celulas['Ano'].notna()]
+    celulas = celulas.assign(
+        CODMUNNASC=pd.Categorical(celulas['CODMUNNASC'].astype(str), categories=codigos),
+        Baixo_Peso=celulas['N'].where(celulas['BAIXO_PESO'], 0),
+    )
+    por_ano = celulas.groupby(['CODMUNNASC', 'Ano'], observed=True)[['Baixo_Peso', 'N']].sum().reset_index()
+    por_ano = por_ano.rename(columns={'Baixo_Peso': 'Nascimentos Abaixo do Peso', 'N': 'Total de Nascimentos'})
+    por_ano['CODMUNNASC'] = por_ano['CODMUNNASC'].astype(str)
+    por_ano['Ano'] = por_ano['Ano'].astype(int)
+    por_ano['Taxa de Nascimento Abaixo do Peso (%)'] = (por_ano['Nascimentos Abaixo do Peso'] / por_ano['Total de Nascimentos']) * 100
+    return por_ano
@@ -0,0 +1,202 @@
+import os
+import importlib.util
+import numpy as np
+from armazenamento import dataset_disponivel, particao_do_arquivo, particoes_dataset
+from comparativo import IndiceMunicipios, comparar_municipios, comparar_municipios_por_ano
+from cubo import calcular_metricas_cubo, filtrar_idade, nascimentos_por_ano_cubo, taxa_por_municipio_cubo
+from ufs import CODIGOS_UF, prefixos_ufs
+
+# Consultas agregadas do dashboard atrás de uma interface única, com dois motores
+# que devolvem os mesmos DataFrames (pequenos, já agregados):
+# - 'pandas': sobre o cubo de agregados em memória (cubo.py + comparativo.py)
+# - 'duckdb': SQL direto sobre os arquivos (dataset Parquet ou, sem ele, os CSVs).
+#   Filtros (UFs, idade da mãe, municípios) vão para a consulta, os arquivos das
+#   outras UFs nem são abertos e os groupbys usam todos os núcleos; nada além do
+#   resultado é carregado na memória do Python. DuckDB é dependência opcional.
+
+# Motor padrão (pode ser trocado com BPN_MOTOR_CONSULTAS=duckdb)
+VARIAVEL_MOTOR = 'BPN_MOTOR_CONSULTAS'
+MOTOR_PADRAO = 'pandas'
+
+COLUNAS_COMPARATIVO = ['CODMUNNASC', 'Nascimentos Abaixo do Peso', 'Total de Nascimentos', 'Taxa de Nascimento Abaixo do Peso (%)']
+
+
+# Função para listar os motores de consulta instalados
+def motores_disponiveis():
+    motores = ['pandas']
+    if importlib.util.find_spec('duckdb') is not None:
+        motores.append('duckdb')
+    return motores
+
+
+# Função para escolher o motor inicial (variável de ambiente, se instalado)
+def motor_inicial():
+    motor = os.environ.get(VARIAVEL_MOTOR, MOTOR_PADRAO).strip().lower()
+    return motor if motor in motores_disponiveis() else MOTOR_PADRAO
+
+
+# Consultas sobre o cubo de agregados em memória (já restrito às UFs, restringir_ufs)
+class ConsultasCubo:
+    motor = 'pandas'
+
+    def __init__(self, cubo):
+        self.cubo = cubo
+        self.indice = IndiceMunicipios(cubo)
+
+    def _filtrado(self, faixa_idade):
+        return self.cubo if faixa_idade is None else filtrar_idade(self.cubo, *faixa_idade)
+
+    # Menor e maior idade da mãe presentes
+    def faixa_idade(self):
+        return int(self.cubo['IDADEMAE'].min()), int(self.cubo['IDADEMAE'].max())
+
+    # (baixo peso, total, taxa %, média da idade da mãe) na faixa de idade
+    def metricas(self, faixa_idade=None):
+        return calcular_metricas_cubo(self._filtrado(faixa_idade))
+
+    def nascimentos_por_ano(self, faixa_idade=None):
+        return nascimentos_por_ano_cubo(self._filtrado(faixa_idade))
+
+    def taxa_por_municipio(self):
+        return taxa_por_municipio_cubo(self.cubo)
+
+    def municipios(self):
+        return self.indice.municipios()
+
+    def comparar_municipios(self, codigos):
+        return comparar_municipios(self.indice, codigos)
+
+    def comparar_municipios_por_ano(self, codigos):
+        return comparar_municipios_por_ano(self.indice, codigos)
+
+
+# Consultas em SQL (DuckDB) sobre os arquivos das UFs. Mesmas regras do cubo: o total
+# conta todos os registros dos arquivos das UFs; baixo peso é 0 < PESO < 2500 em
+# município das UFs; idade fora de 0-255 é nula; o ano vem de DTNASC.
+class ConsultasDuckDB:
+    motor = 'duckdb'
+
+    def __init__(self, ufs, diretorio_parquet, diretorio_csv):
+        import duckdb
+
+        ufs = [uf for uf in ufs if uf in CODIGOS_UF]
+        self.conexao = duckdb.connect()
+        self.fonte = self._fonte_parquet(ufs, diretorio_parquet) if dataset_disponivel(diretorio_parquet) else None
+        if self.fonte is None and os.path.isdir(diretorio_csv):
+            self.fonte = self._fonte_csv(ufs, diretorio_csv)
+        if self.fonte is None:
+            raise ValueError(f'Nenhum arquivo de dados para {", ".join(ufs)}')
+
+        # Prefixos (só dígitos, da tabela de UFs) entram direto na expressão
+        prefixos = '|'.join(prefixos_ufs(ufs))
+        self.nascimentos = f'''(
+            SELECT CODMUNNASC, Ano,
+                   CASE WHEN IDADEMAE BETWEEN 0 AND 255 THEN round(IDADEMAE) END AS IDADEMAE,
+                   coalesce(PESO > 0 AND PESO < 2500 AND regexp_matches(CODMUNNASC, '^({prefixos})'), false) AS BAIXO_PESO
+            FROM {self.fonte}
+        ) AS nascimentos'''
+
+        # Faixa de idade e lista de municípios não dependem dos filtros: calculadas uma
+        # vez, numa só passada (a instância fica em cache entre os reruns)
+        por_municipio = self._consultar(f'''
+            SELECT CODMUNNASC, min(IDADEMAE) AS minimo, max(IDADEMAE) AS maximo
+            FROM {self.nascimentos} GROUP BY CODMUNNASC''')
+        self._faixa_idade = int(por_municipio['minimo'].min()), int(por_municipio['maximo'].max())
+        self._municipios = sorted(por_municipio['CODMUNNASC'].dropna().tolist())
+
+    # Partições UF=/ANO= das UFs: só esses arquivos entram na consulta
+    def _fonte_parquet(self, ufs, diretorio_parquet):
+        arquivos = [os.path.join(diretorio, 'part-0.parquet') for uf, _, diretorio in particoes_dataset(diretorio_parquet) if uf in ufs]
+        if not arquivos:
+            return None
+        return f'''(
+            SELECT CAST(CODMUNNASC AS VARCHAR) AS CODMUNNASC, year(DTNASC) AS Ano,
+                   CAST(IDADEMAE AS DOUBLE) AS IDADEMAE, CAST(PESO AS DOUBLE) AS PESO
+            FROM read_parquet({self._lista(arquivos)}, union_by_name = true)
+        )'''
+
+    # CSVs DN<UF><ANO> das UFs, lidos como texto e convertidos como no pandas
+    # (vírgula decimal no PESO, DTNASC DDMMAAAA)
+    def _fonte_csv(self, ufs, diretorio_csv):
+        arquivos = [os.path.join(diretorio_csv, arquivo) for arquivo in sorted(os.listdir(diretorio_csv))
+                    if arquivo.lower().endswith('.csv') and (particao_do_arquivo(arquivo) or (None,))[0] in ufs]
+        if not arquivos:
+            return None
+        return f'''(
+            SELECT trim(CODMUNNASC) AS CODMUNNASC,
+                   year(try_strptime(lpad(trim(DTNASC), 8, '0'), '%d%m%Y')) AS Ano,
+                   TRY_CAST(trim(IDADEMAE) AS DOUBLE) AS IDADEMAE,
+                   TRY_CAST(replace(trim(PESO), ',', '.') AS DOUBLE) AS PESO
+            FROM read_csv({self._lista(arquivos)}, all_varchar = true, union_by_name = true)
+        )'''
+
+    @staticmethod
+    def _lista(arquivos):
+        return '[' + ', '.join("'" + arquivo.replace("'", "''") + "'" for arquivo in arquivos) + ']'
+
+    # Executa a consulta num cursor próprio (cada sessão do Streamlit roda numa thread)
+    def _consultar(self, sql, parametros=None):
+        return self.conexao.cursor().execute(sql, parametros or []).df()
+
+    @staticmethod
+    def _condicao_idade(faixa_idade):
+        if faixa_idade is None:
+            return 'TRUE', []
+        return 'IDADEMAE BETWEEN ? AND ?', [float(faixa_idade[0]), float(faixa_idade[1])]
+
+    def faixa_idade(self):
+        return self._faixa_idade
+
+    def metricas(self, faixa_idade=None):
+        condicao, parametros = self._condicao_idade(faixa_idade)
+        linha = self._consultar(f'''
+            SELECT count(*) AS total, CAST(count_if(BAIXO_PESO) AS BIGINT) AS baixo_peso, avg(IDADEMAE) AS media_idade
+            FROM {self.nascimentos} WHERE {condicao}''', parametros).iloc[0]
+        total, baixo_peso = int(linha['total']), int(linha['baixo_peso'])
+        if total == 0:
+            return None, None, None, None
+        return baixo_peso, total, (baixo_peso / total) * 100, float(linha['media_idade'])
+
+    def nascimentos_por_ano(self, faixa_idade=None):
+        condicao, parametros = self._condicao_idade(faixa_idade)
+        df_combined = self._consultar(f'''
+            SELECT Ano, count(*) AS Total_Nascimentos, CAST(count_if(BAIXO_PESO) AS BIGINT) AS Total_Baixo_Peso
+            FROM {self.nascimentos} WHERE Ano IS NOT NULL AND {condicao}
+            GROUP BY Ano ORDER BY Ano''', parametros)
+        df_combined['Ano'] = df_combined['Ano'].astype(int)
+        return df_combined
+
+    def taxa_por_municipio(self):
+        return self._consultar(f'''
+            SELECT CODMUNNASC, CAST(count_if(BAIXO_PESO) AS BIGINT) AS Nascimentos_Abaixo_Peso, count(*) AS Total_Nascimentos,
+                   100.0 * count_if(BAIXO_PESO) / count(*) AS Taxa_Abaixo_Peso
+            FROM {self.nascimentos} WHERE CODMUNNASC IS NOT NULL
+            GROUP BY CODMUNNASC ORDER BY CODMUNNASC''')
+
+    def municipios(self):
+        return list(self._municipios)
+
+    def comparar_municipios(self, codigos):
+        codigos = [str(codigo) for codigo in codigos]
+        agregados = self._consultar(f'''
+            SELECT CODMUNNASC, CAST(count_if(BAIXO_PESO) AS BIGINT) AS "Nascimentos Abaixo do Peso", count(*) AS "Total de Nascimentos"
+            FROM {self.nascimentos} WHERE list_contains(?, CODMUNNASC)
+            GROUP BY CODMUNNASC''', [codigos]).set_index('CODMUNNASC')
+
+        # Na ordem pedida, com zero para os municípios sem registros
+        df_metricas = agregados.reindex(codigos, fill_value=0).rename_axis('CODMUNNASC').reset_index()
+        total = df_metricas['Total de Nascimentos'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df_metricas['Taxa de Nascimento Abaixo do Peso (%)'] = np.where(
+                total > 0, df_metricas['Nascimentos Abaixo do Peso'] / total * 100, np.nan)
+        return df_metricas[COLUNAS_COMPARATIVO]
+
+    def comparar_municipios_por_ano(self, codigos):
+        codigos = [str(codigo) for codigo in codigos]
+        por_ano = self._consultar(f'''
+            SELECT CODMUNNASC, Ano, CAST(count_if(BAIXO_PESO) AS BIGINT) AS "Nascimentos Abaixo do Peso", count(*) AS "Total de Nascimentos"
+            FROM {self.nascimentos} WHERE list_contains($codigos, CODMUNNASC) AND Ano IS NOT NULL
+            GROUP BY CODMUNNASC, Ano ORDER BY list_position($codigos, CODMUNNASC), Ano''', {'codigos': codigos})
+        por_ano['Ano'] = por_ano['Ano'].astype(int)
+        por_ano['Taxa de Nascimento Abaixo do Peso (%)'] = (por_ano['Nascimentos Abaixo do Peso'] / por_ano['Total de Nascimentos']) * 100
+        return por_ano
@@ -0,0 +1,114 @@
+import os
+import pandas as pd
+from ufs import prefixos_ufs
+from processamento import converter_codigo_municipio, converter_dtnasc, converter_idade, converter_peso, mascara_baixo_peso, mascara_municipios_uf, somar_contagens
+
+# O cubo guarda a contagem de nascimentos por (UF do arquivo, município, ano, idade da
+# mãe, baixo peso).
+# Todas as métricas do dashboard são somas sobre ele, então o tamanho dele depende
+# só da quantidade de combinações (~5.570 municípios x anos x ~50 idades x 2), e não
+# do número de registros. BAIXO_PESO aqui é só o critério de peso; a restrição aos
+# municípios das UFs selecionadas é aplicada na consulta (restringir_ufs).
+DIMENSOES_CUBO = ['UF', 'CODMUNNASC', 'Ano', 'IDADEMAE', 'BAIXO_PESO']
+
+# Colunas do dataset necessárias para montar o cubo
+COLUNAS_CUBO = ['UF', 'DTNASC', 'PESO', 'IDADEMAE', 'CODMUNNASC']
+
+# Nome do arquivo do cubo dentro do dataset Parquet (o prefixo '_' faz o
+# pyarrow.dataset ignorá-lo ao ler as partições)
+ARQUIVO_CUBO = '_cubo.parquet'
+
+
+# Função para montar o cubo de contagens a partir dos registros individuais
+# (aceita tanto o dataset bruto quanto o já pré-processado, sem alterá-lo).
+# Registros sem a coluna UF (arquivo de origem) entram com UF nula.
+def construir_cubo(df):
+    if 'Ano' in df:
+        ano = df['Ano'].astype('Int16')
+    else:
+        _, ano, _ = converter_dtnasc(df['DTNASC'])
+    codmun = converter_codigo_municipio(df['CODMUNNASC'])
+    peso = converter_peso(df['PESO'])
+
+    # Critério de peso do preprocess_data: 0 < PESO < 2500
+    dimensoes = pd.DataFrame({
+        'UF': df['UF'].astype('category') if 'UF' in df else pd.Series(None, index=df.index, dtype='category'),
+        'CODMUNNASC': codmun,
+        'Ano': ano,
+        'IDADEMAE': converter_idade(df['IDADEMAE']),
+        'BAIXO_PESO': mascara_baixo_peso(pd.DataFrame({'PESO': peso}), None),
+    })
+    cubo = dimensoes.groupby(DIMENSOES_CUBO, dropna=False, observed=True).size().reset_index(name='N')
+    cubo['N'] = cubo['N'].astype('int64')
+    return cubo
+
+
+# Função para somar cubos parciais (ex.: um por lote do dataset) em um só
+def combinar_cubos(cubos):
+    cubo = somar_contagens(cubos, DIMENSOES_CUBO, ('UF', 'CODMUNNASC'), dropna=False)
+    if cubo is None:
+        return None
+    return cubo[cubo['N'] > 0].reset_index(drop=True)
+
+
+# Função para restringir o cubo às UFs selecionadas: mantém os arquivos dessas UFs
+# e só conta baixo peso nos municípios delas (equivale ao startswith do preprocess_data)
+def restringir_ufs(cubo, ufs):
+    cubo = cubo[cubo['UF'].isin(list(ufs))]
+    na_uf = mascara_municipios_uf(cubo['CODMUNNASC'], prefixos_ufs(ufs))
+    return cubo.assign(BAIXO_PESO=cubo['BAIXO_PESO'].to_numpy() & na_uf)
+
+
+# Função para gravar o cubo junto do dataset Parquet
+def salvar_cubo(cubo, diretorio_parquet):
+    caminho = os.path.join(diretorio_parquet, ARQUIVO_CUBO)
+    cubo.to_parquet(caminho, index=False, compression='zstd')
+    return caminho
+
+
+# Função para ler o cubo gravado (None se ainda não existir)
+def ler_cubo(diretorio_parquet):
+    caminho = os.path.join(diretorio_parquet, ARQUIVO_CUBO)
+    if not os.path.exists(caminho):
+        return None
+    return pd.read_parquet(caminho)
+
+
+# Função para filtrar o cubo pela faixa etária da mãe (idades nulas ficam de fora,
+# como no filtro por máscara sobre os registros)
+def filtrar_idade(cubo, idade_min, idade_max):
+    return cubo[(cubo['IDADEMAE'] >= idade_min) & (cubo['IDADEMAE'] <= idade_max)]
+
+
+# Função para calcular as métricas gerais a partir do cubo
+def calcular_metricas_cubo(cubo):
+    soma_total_nascidos = int(cubo['N'].sum())
+    if soma_total_nascidos == 0:
+        return None, None, None, None
+    soma_nascidos_abaixo_peso = int(cubo.loc[cubo['BAIXO_PESO'], 'N'].sum())
+    taxa_total_pb = (soma_nascidos_abaixo_peso / soma_total_nascidos) * 100
+
+    # Média ponderada pela contagem, ignorando idades nulas
+    com_idade = cubo[cubo['IDADEMAE'].notna()]
+    media_idade_mae = (com_idade['IDADEMAE'].astype('float64') * com_idade['N']).sum() / com_idade['N'].sum()
+
+    return soma_nascidos_abaixo_peso, soma_total_nascidos, taxa_total_pb, media_idade_mae
+
+
+# Função para contar nascimentos (total e abaixo do peso) por ano
+def nascimentos_por_ano_cubo(cubo):
+    cubo = cubo[cubo['Ano'].notna()]
+    total = cubo.groupby('Ano')['N'].sum()
+    baixo_peso = cubo[cubo['BAIXO_PESO']].groupby('Ano')['N'].sum()
+    df_combined = pd.DataFrame({'Total_Nascimentos': total, 'Total_Baixo_Peso': baixo_peso}).reset_index()
+    df_combined['Ano'] = df_combined['Ano'].astype(int)
+    return df_combined
+
+
+# Função para calcular nascimentos e taxa de baixo peso por município
+def taxa_por_municipio_cubo(cubo):
+    total = cubo.groupby('CODMUNNASC', observed=True)['N'].sum()
+    baixo_peso = cubo[cubo['BAIXO_PESO']].groupby('CODMUNNASC', observed=True)['N'].sum()
+    merged = pd.DataFrame({'Nascimentos_Abaixo_Peso': baixo_peso, 'Total_Nascimentos': total}).fillna(0)
+    merged['Taxa_Abaixo_Peso'] = (merged['Nascimentos_Abaixo_Peso'] / merged['Total_Nascimentos']) * 100
+    return merged.reset_index()
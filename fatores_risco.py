@@ -0,0 +1,361 @@
+import warnings
+import numpy as np
+import pandas as pd
+from armazenamento import TAMANHO_LOTE_LEITURA, lotes_por_uf
+from codificacao import DTYPES_CODIGOS_CSV, TIPOS_CODIGOS, codificar_codigos
+from processamento import converter_codigo_municipio, converter_dtnasc, converter_idade, converter_peso, mascara_municipios_uf, somar_contagens
+from ufs import prefixos_ufs
+
+# Análise dos fatores de risco de baixo peso ao nascer citados na página inicial:
+# pré-natal insuficiente, prematuridade, gravidez múltipla e mãe adolescente.
+# Com quatro fatores binários, os registros se resumem a contagens por (município,
+# ano, padrão de exposição, baixo peso), como no cubo: 16 padrões x 2 desfechos por
+# município e ano. Taxas, razões de chances e a regressão logística (IRLS) são
+# calculadas sobre essas contagens, em lote para todos os grupos de uma vez, e o
+# bootstrap reamostra as contagens (multinomial) em vez dos registros.
+
+# Fatores analisados (coluna do padrão de exposição → descrição)
+FATORES = {
+    'PRENATAL_INSUFICIENTE': 'Menos de 7 consultas de pré-natal',
+    'PREMATURO': 'Gestação com menos de 37 semanas',
+    'GRAVIDEZ_MULTIPLA': 'Gravidez múltipla',
+    'MAE_ADOLESCENTE': 'Mãe com menos de 20 anos',
+}
+
+# Colunas do SINASC necessárias para a análise
+COLUNAS_FATORES = ['UF', 'DTNASC', 'PESO', 'IDADEMAE', 'CODMUNNASC', 'CONSULTAS', 'GESTACAO', 'GRAVIDEZ']
+
+# Colunas de códigos dos fatores (codificadas em 1 byte, codificacao.py) e chaves
+# das contagens dos padrões de exposição e dos códigos
+COLUNAS_CODIGOS_FATORES = ['CONSULTAS', 'GESTACAO', 'GRAVIDEZ']
+CHAVES_CONTAGENS = ['CODMUNNASC', 'Ano', 'PADRAO', 'BAIXO_PESO']
+CHAVES_CODIGOS = ['CODMUNNASC', 'Ano', 'COLUNA', 'CODIGO', 'BAIXO_PESO']
+
+# Quantidade de padrões de exposição (combinações dos fatores binários)
+QUANTIDADE_PADROES = 2 ** len(FATORES)
+
+# Mínimo de nascimentos com baixo peso por fator para ajustar a regressão de um
+# grupo (regra usual de 10 eventos por variável)
+EVENTOS_POR_FATOR = 10
+
+# Quantil da normal para intervalos de 95%
+Z_95 = 1.959963984540054
+
+
+# Função para codificar uma exposição a partir de uma coluna de códigos já codificada
+# (codificacao.py): 1 nos códigos expostos, 0 nos não expostos e nulo nos demais
+# (ignorado/9 e vazios). A regra roda só sobre as poucas categorias e é aplicada aos
+# códigos de 1 byte dos registros com um take.
+def exposicao(serie, expostos, nao_expostos):
+    categorias = serie.cat.categories.to_numpy()
+    tabela = np.where(np.isin(categorias, expostos), 1.0, np.where(np.isin(categorias, nao_expostos), 0.0, np.nan))
+    return np.append(tabela, np.nan)[serie.cat.codes.to_numpy()]
+
+
+# Função para calcular a matriz de exposições (registros x fatores, na ordem de FATORES).
+# Códigos do SINASC: CONSULTAS 1=nenhuma, 2=1-3, 3=4-6, 4=7 ou mais; GESTACAO 1 a 4
+# = menos de 37 semanas, 5 e 6 = 37 ou mais; GRAVIDEZ 1=única, 2=dupla, 3=tripla ou mais.
+def matriz_exposicoes(df):
+    codificar_codigos(df)
+    idade = converter_idade(df['IDADEMAE']).astype('float64').to_numpy()
+    idade[idade >= 99] = np.nan  # 99 = ignorada
+    return np.column_stack([
+        exposicao(df['CONSULTAS'], [1, 2, 3], [4]),
+        exposicao(df['GESTACAO'], [1, 2, 3, 4], [5, 6]),
+        exposicao(df['GRAVIDEZ'], [2, 3], [1]),
+        np.where(np.isnan(idade), np.nan, (idade < 20).astype('float64')),
+    ])
+
+
+# Função para contar os nascimentos de um lote (as colunas de códigos são codificadas
+# no próprio lote, in-place). Devolve:
+# - as contagens por (município, ano, padrão de exposição, baixo peso), só com os
+#   registros completos (peso válido e os quatro fatores conhecidos);
+# - as contagens por (município, ano, coluna, código, baixo peso) de cada coluna de
+#   COLUNAS_CODIGOS_FATORES, com todos os registros de peso válido (CODIGO é o
+#   código de 1 byte da categoria; -1 = nulo).
+def contar_fatores(df):
+    exposicoes = matriz_exposicoes(df)
+    peso = converter_peso(df['PESO']).to_numpy(dtype='float64')
+    ano = df['Ano'] if 'Ano' in df else converter_dtnasc(df['DTNASC'])[1]
+    codmun = converter_codigo_municipio(df['CODMUNNASC'])
+
+    valido = (peso > 0) & ano.notna().to_numpy() & codmun.notna().to_numpy()
+    completo = valido & np.isfinite(exposicoes).all(axis=1)
+    padrao = (np.nan_to_num(exposicoes).astype('int64') << np.arange(len(FATORES))).sum(axis=1)
+    contagens = pd.DataFrame({
+        'CODMUNNASC': codmun[completo],
+        'Ano': ano[completo].astype('Int16'),
+        'PADRAO': padrao[completo].astype('int8'),
+        'BAIXO_PESO': peso[completo] < 2500,
+    }).groupby(CHAVES_CONTAGENS, observed=True).size().reset_index(name='N')
+    contagens.attrs['incompletos'] = int((~completo).sum())
+
+    codigos = pd.concat([pd.DataFrame({
+        'CODMUNNASC': codmun[valido],
+        'Ano': ano[valido].astype('Int16'),
+        'COLUNA': coluna,
+        'CODIGO': df[coluna].cat.codes.to_numpy()[valido],
+        'BAIXO_PESO': peso[valido] < 2500,
+    }) for coluna in COLUNAS_CODIGOS_FATORES], ignore_index=True).groupby(CHAVES_CODIGOS, observed=True).size().reset_index(name='N')
+    return contagens, codigos
+
+
+# Função para somar as contagens dos lotes, levando junto o total de registros
+# incompletos de cada parte
+def combinar_contagens(partes, chaves=CHAVES_CONTAGENS):
+    partes = list(partes)
+    contagens = somar_contagens(partes, chaves)
+    if contagens is not None:
+        contagens.attrs['incompletos'] = sum(parte.attrs.get('incompletos', 0) for parte in partes if parte is not None)
+    return contagens
+
+
+# Função para carregar as contagens das UFs em uma passada pelos dados, em lotes
+# (lotes_por_uf: o dataset Parquet ou, sem ele, os CSVs). As colunas de códigos
+# chegam como categorias (dicionário do Arrow ou dtype do read_csv) e são
+# codificadas em cada lote, sem uma string por registro. Devolve as contagens dos
+# padrões de exposição e as dos códigos (contar_fatores).
+def carregar_contagens_fatores(ufs, diretorio_parquet, diretorio_csv, tamanho_lote=TAMANHO_LOTE_LEITURA):
+    dtype = {coluna: DTYPES_CODIGOS_CSV.get(coluna, str) for coluna in COLUNAS_FATORES}
+    partes = [contar_fatores(lote) for lote in lotes_por_uf(ufs, COLUNAS_FATORES, diretorio_parquet, diretorio_csv, tamanho_lote, dtype)]
+    return (restringir_municipios(combinar_contagens([contagens for contagens, _ in partes]), ufs),
+            restringir_municipios(combinar_contagens([codigos for _, codigos in partes], CHAVES_CODIGOS), ufs))
+
+
+# Função para manter só os municípios das UFs (nascimentos de fora são parciais:
+# o arquivo de uma UF só traz os nascidos de mães residentes nela)
+def restringir_municipios(contagens, ufs):
+    if contagens is None:
+        return None
+    restritas = contagens[mascara_municipios_uf(contagens['CODMUNNASC'], prefixos_ufs(ufs))].reset_index(drop=True)
+    restritas['CODMUNNASC'] = restritas['CODMUNNASC'].cat.remove_unused_categories()
+    restritas.attrs = contagens.attrs
+    return restritas
+
+
+# Contagens em forma de matriz (municípios x anos x padrões x desfecho), para
+# selecionar qualquer subconjunto de municípios/anos fatiando a matriz. As
+# contagens dos códigos, quando dadas, ficam em uma matriz por coluna (municípios
+# x anos x categorias + nulo x desfecho).
+class TabelaFatores:
+    def __init__(self, contagens, codigos=None):
+        fontes = [contagens] if codigos is None else [contagens, codigos]
+        self.municipios = sorted({str(codigo) for fonte in fontes for codigo in fonte['CODMUNNASC'].unique()})
+        self.anos = sorted({int(ano) for fonte in fontes for ano in fonte['Ano'].unique()})
+        self.incompletos = contagens.attrs.get('incompletos', 0)
+
+        self.contagens = np.zeros((len(self.municipios), len(self.anos), QUANTIDADE_PADROES, 2), dtype='int64')
+        linhas, colunas = self._posicoes(contagens)
+        np.add.at(self.contagens,
+                  (linhas, colunas, contagens['PADRAO'].to_numpy(), contagens['BAIXO_PESO'].to_numpy().astype(int)),
+                  contagens['N'].to_numpy())
+
+        self.codigos = {}
+        for coluna in ([] if codigos is None else COLUNAS_CODIGOS_FATORES):
+            parte = codigos[codigos['COLUNA'] == coluna]
+            quantidade = len(TIPOS_CODIGOS[coluna].categories)
+            self.codigos[coluna] = np.zeros((len(self.municipios), len(self.anos), quantidade + 1, 2), dtype='int64')
+            linhas, colunas = self._posicoes(parte)
+            # Código -1 (nulo) vai para a última posição
+            np.add.at(self.codigos[coluna],
+                      (linhas, colunas, np.where(parte['CODIGO'] < 0, quantidade, parte['CODIGO']), parte['BAIXO_PESO'].to_numpy().astype(int)),
+                      parte['N'].to_numpy())
+
+    # Posições (município, ano) de cada linha de uma tabela de contagens
+    def _posicoes(self, contagens):
+        linhas = pd.Categorical(contagens['CODMUNNASC'].astype(str), categories=self.municipios).codes
+        return linhas, np.searchsorted(self.anos, contagens['Ano'].astype(int).to_numpy())
+
+    # Índices das linhas (municípios) e colunas (anos) de uma seleção
+    def _selecao(self, municipios=None, anos=None):
+        linhas = np.arange(len(self.municipios)) if municipios is None else \
+            np.array([self.municipios.index(str(codigo)) for codigo in municipios if str(codigo) in self.municipios], dtype=int)
+        colunas = np.arange(len(self.anos)) if anos is None else \
+            np.array([self.anos.index(int(ano)) for ano in anos if int(ano) in self.anos], dtype=int)
+        return linhas, colunas
+
+    # Nascimentos e baixo peso por código de uma coluna na seleção. A coluna sai
+    # codificada (tipo de codificacao.py); os rótulos ficam para a exibição.
+    def distribuicao(self, coluna, municipios=None, anos=None):
+        linhas, colunas = self._selecao(municipios, anos)
+        contagens = self.codigos[coluna][np.ix_(linhas, colunas)].sum(axis=(0, 1))
+        tipo = TIPOS_CODIGOS[coluna]
+        distribuicao = pd.DataFrame({
+            coluna: pd.Categorical.from_codes(np.append(np.arange(len(tipo.categories)), -1), dtype=tipo),
+            'Nascimentos': contagens.sum(axis=1),
+            'Nascimentos Abaixo do Peso': contagens[:, 1],
+        })
+        distribuicao = distribuicao[distribuicao['Nascimentos'] > 0].reset_index(drop=True)
+        distribuicao['Taxa de Nascimento Abaixo do Peso (%)'] = distribuicao['Nascimentos Abaixo do Peso'] / distribuicao['Nascimentos'] * 100
+        return distribuicao
+
+    # Contagens (grupos x padrões x desfecho) de um subconjunto: um grupo por
+    # município (por_municipio=True) ou um grupo só com a soma da seleção
+    def selecionar(self, municipios=None, anos=None, por_municipio=False):
+        linhas, colunas = self._selecao(municipios, anos)
+        contagens = self.contagens[np.ix_(linhas, colunas)].sum(axis=1)
+        if por_municipio:
+            return contagens, [self.municipios[linha] for linha in linhas]
+        return contagens.sum(axis=0, keepdims=True), ['Seleção']
+
+
+# Função para montar a matriz dos padrões de exposição (padrões x fatores, 0/1)
+def matriz_padroes():
+    return (np.arange(QUANTIDADE_PADROES)[:, None] >> np.arange(len(FATORES)) & 1).astype('float64')
+
+
+# Função para calcular as taxas estratificadas por fator: nascimentos e baixo peso
+# entre expostos e não expostos (arrays grupos x fatores)
+def taxas_estratificadas(contagens):
+    padroes = matriz_padroes()
+    nascimentos = contagens.sum(axis=-1).astype('float64')
+    baixo_peso = contagens[..., 1].astype('float64')
+    n_expostos, bp_expostos = nascimentos @ padroes, baixo_peso @ padroes
+    n_nao_expostos = nascimentos.sum(axis=-1, keepdims=True) - n_expostos
+    bp_nao_expostos = baixo_peso.sum(axis=-1, keepdims=True) - bp_expostos
+    return n_expostos, bp_expostos, n_nao_expostos, bp_nao_expostos
+
+
+# Função para calcular as razões de chances brutas com IC de Woolf (grupos x fatores).
+# Tabelas com alguma célula zero recebem a correção de Haldane-Anscombe (+0,5).
+def razoes_de_chances(contagens, z=Z_95):
+    n_expostos, a, n_nao_expostos, c = taxas_estratificadas(contagens)
+    b, d = n_expostos - a, n_nao_expostos - c
+    correcao = np.where((np.minimum(np.minimum(a, b), np.minimum(c, d)) == 0), 0.5, 0.0)
+    a, b, c, d = a + correcao, b + correcao, c + correcao, d + correcao
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_or = np.log(a * d / (b * c))
+        erro = np.sqrt(1 / a + 1 / b + 1 / c + 1 / d)
+    return np.exp(log_or), np.exp(log_or - z * erro), np.exp(log_or + z * erro)
+
+
+# Função para a matriz de informação de cada grupo (X' W X + penalidade)
+def informacao(desenho, pesos, penalidade):
+    return desenho.T @ (pesos[..., None] * desenho) + penalidade + 1e-10 * np.eye(desenho.shape[1])
+
+
+# Função para os mínimos quadrados ponderados de cada grupo (resposta e pesos: grupos x padrões)
+def minimos_quadrados_ponderados(desenho, resposta, pesos, penalidade):
+    return np.linalg.solve(informacao(desenho, pesos, penalidade), ((pesos * resposta) @ desenho)[..., None])[..., 0]
+
+
+# Função para a log-verossimilhança binomial (penalizada) de cada grupo
+def log_verossimilhanca(beta, desenho, nascimentos, baixo_peso, penalidade):
+    eta = beta @ desenho.T
+    return (baixo_peso * eta - nascimentos * np.logaddexp(0, eta)).sum(axis=1) - 0.5 * np.einsum('gi,ij,gj->g', beta, penalidade, beta)
+
+
+# Função para indicar os grupos em que a regressão é estimável: eventos suficientes
+# e, para cada fator, nascimentos com e sem baixo peso entre expostos e não expostos
+def grupos_estimaveis(contagens, eventos_por_fator=EVENTOS_POR_FATOR):
+    n_expostos, a, n_nao_expostos, c = taxas_estratificadas(contagens)
+    celulas = (np.minimum(np.minimum(a, n_expostos - a), np.minimum(c, n_nao_expostos - c)) > 0).all(axis=-1)
+    return celulas & (contagens[..., 1].sum(axis=-1) >= eventos_por_fator * len(FATORES))
+
+
+# Função para ajustar a regressão logística baixo peso ~ fatores por IRLS, para
+# todos os grupos ao mesmo tempo (contagens com formato ... x padrões x desfecho).
+# Só os grupos estimáveis são ajustados (os demais ficam nulos) e cada iteração só
+# toca os grupos que ainda não convergiram. A penalização (ridge) pequena só
+# estabiliza grupos com padrões vazios.
+# Devolve coeficientes e erros padrão (... x [intercepto + fatores]) e a convergência.
+def regressao_logistica(contagens, iteracoes=50, tolerancia=1e-8, penalizacao=1e-4, eventos_por_fator=EVENTOS_POR_FATOR):
+    formato = contagens.shape[:-2]
+    contagens = contagens.reshape(-1, QUANTIDADE_PADROES, 2).astype('float64')
+    desenho = np.column_stack([np.ones(QUANTIDADE_PADROES), matriz_padroes()])
+    nascimentos, baixo_peso = contagens.sum(axis=-1), contagens[..., 1]
+    penalidade = penalizacao * np.diag([0.0] + [1.0] * len(FATORES))
+
+    beta = np.full((len(contagens), desenho.shape[1]), np.nan)
+    erro_padrao = np.full_like(beta, np.nan)
+    convergiu = np.zeros(len(contagens), dtype=bool)
+    ativos = np.flatnonzero(grupos_estimaveis(contagens, eventos_por_fator))
+    n, y = nascimentos[ativos], baixo_peso[ativos]
+
+    # Partida como no glm: mínimos quadrados ponderados sobre o logit empírico de
+    # cada padrão (Newton a partir de zero diverge com efeitos fortes, ex.: prematuridade)
+    mu = (y + 0.5) / (n + 1.0)
+    beta[ativos] = minimos_quadrados_ponderados(desenho, np.log(mu / (1 - mu)), n * mu * (1 - mu), penalidade)
+    verossimilhanca = log_verossimilhanca(beta[ativos], desenho, n, y, penalidade)
+    for _ in range(iteracoes):
+        if not len(ativos):
+            break
+        b = beta[ativos]
+        mu = 1 / (1 + np.exp(-(b @ desenho.T)))
+        gradiente = (y - n * mu) @ desenho - b @ penalidade
+        passo = np.linalg.solve(informacao(desenho, n * mu * (1 - mu), penalidade), gradiente[..., None])[..., 0]
+
+        # Passo reduzido à metade nos grupos em que a verossimilhança piora
+        for _ in range(10):
+            nova = log_verossimilhanca(b + passo, desenho, n, y, penalidade)
+            piorou = nova < verossimilhanca - 1e-12 * np.abs(verossimilhanca)
+            if not piorou.any():
+                break
+            passo[piorou] /= 2
+        beta[ativos] = b + passo
+
+        continua = np.abs(passo).max(axis=1) >= tolerancia
+        convergiu[ativos[~continua]] = True
+        ativos, n, y, verossimilhanca = ativos[continua], n[continua], y[continua], nova[continua]
+
+    ajustados = np.flatnonzero(convergiu)
+    mu = 1 / (1 + np.exp(-(beta[ajustados] @ desenho.T)))
+    hessiana = informacao(desenho, nascimentos[ajustados] * mu * (1 - mu), penalidade)
+    erro_padrao[ajustados] = np.sqrt(np.diagonal(np.linalg.inv(hessiana), axis1=1, axis2=2))
+    beta[~convergiu] = np.nan
+    return beta.reshape(*formato, -1), erro_padrao.reshape(*formato, -1), convergiu.reshape(formato)
+
+
+# Função para o bootstrap da regressão: reamostra as contagens de cada grupo
+# (multinomial sobre padrões x desfecho, equivalente a reamostrar os registros) e
+# ajusta todas as reamostras de uma vez. Devolve os percentis dos coeficientes
+# (reamostras não estimáveis ficam de fora).
+def bootstrap_logistica(contagens, reamostras=200, semente=0, percentis=(2.5, 97.5)):
+    rng = np.random.default_rng(semente)
+    planas = contagens.reshape(len(contagens), -1)
+    totais = planas.sum(axis=1)
+    probabilidades = np.where(totais[:, None] > 0, planas / np.maximum(totais, 1)[:, None], 1.0 / planas.shape[1])
+    amostras = rng.multinomial(totais, probabilidades, size=(reamostras, len(contagens)))
+    beta, _, _ = regressao_logistica(amostras.reshape(reamostras, len(contagens), QUANTIDADE_PADROES, 2))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # grupos sem nenhuma reamostra estimável
+        return np.nanpercentile(beta, percentis, axis=0)
+
+
+# Função para a análise completa de um subconjunto de municípios/anos: taxas por
+# fator e razões de chances brutas (Woolf) e ajustadas (regressão logística, com IC
+# de Wald e, se reamostras > 0, de bootstrap). Devolve (taxas, razoes) em DataFrames.
+def analisar_fatores(tabela, municipios=None, anos=None, por_municipio=False, reamostras=0, semente=0):
+    contagens, grupos = tabela.selecionar(municipios, anos, por_municipio)
+    nomes_fatores = list(FATORES)
+
+    n_expostos, bp_expostos, n_nao_expostos, bp_nao_expostos = taxas_estratificadas(contagens)
+    taxas = pd.DataFrame({
+        'Grupo': np.repeat(grupos, len(FATORES) * 2),
+        'Fator': np.tile(np.repeat([FATORES[fator] for fator in nomes_fatores], 2), len(grupos)),
+        'Exposto': np.tile([True, False], len(grupos) * len(FATORES)),
+        'Nascimentos': np.stack([n_expostos, n_nao_expostos], axis=-1).ravel().astype('int64'),
+        'Nascimentos Abaixo do Peso': np.stack([bp_expostos, bp_nao_expostos], axis=-1).ravel().astype('int64'),
+    })
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxas['Taxa de Baixo Peso (%)'] = taxas['Nascimentos Abaixo do Peso'] / taxas['Nascimentos'] * 100
+
+    razao, razao_inf, razao_sup = razoes_de_chances(contagens)
+    beta, erro_padrao, convergiu = regressao_logistica(contagens)
+    razoes = pd.DataFrame({
+        'Grupo': np.repeat(grupos, len(FATORES)),
+        'Fator': np.tile([FATORES[fator] for fator in nomes_fatores], len(grupos)),
+        'OR bruta': razao.ravel(),
+        'IC 95% inf (bruta)': razao_inf.ravel(),
+        'IC 95% sup (bruta)': razao_sup.ravel(),
+        'OR ajustada': np.exp(beta[:, 1:]).ravel(),
+        'IC 95% inf (ajustada)': np.exp(beta[:, 1:] - Z_95 * erro_padrao[:, 1:]).ravel(),
+        'IC 95% sup (ajustada)': np.exp(beta[:, 1:] + Z_95 * erro_padrao[:, 1:]).ravel(),
+        'Convergiu': np.repeat(convergiu, len(FATORES)),
+    })
+    if reamostras:
+        inferior, superior = bootstrap_logistica(contagens, reamostras, semente)
+        razoes['IC 95% inf (bootstrap)'] = np.exp(inferior[:, 1:]).ravel()
+        razoes['IC 95% sup (bootstrap)'] = np.exp(superior[:, 1:]).ravel()
+    return taxas, razoes
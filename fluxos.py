@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from armazenamento import TAMANHO_LOTE_LEITURA, lotes_por_uf
+from processamento import converter_codigo_municipio, converter_dtnasc, converter_peso, somar_contagens
+
+# Fluxos entre o município de residência da mãe (CODMUNRES) e o de ocorrência do
+# parto (CODMUNNASC). Os registros se resumem a contagens por (residência, parto,
+# ano, baixo peso) e, para cada ano, a duas matrizes esparsas município x município
+# (total e baixo peso; linha = residência, coluna = parto). Quase todas as mães dão
+# à luz no próprio município ou em poucos polos, então cada linha tem poucas
+# entradas: ~5.570² células possíveis, dezenas de milhares preenchidas. Somar os
+# anos filtrados e tirar entradas, saídas ou os maiores fluxos são operações sobre
+# essas poucas entradas, rápidas o bastante para cada rerun.
+# Os arquivos DN<UF><ANO> trazem as mães residentes na UF, então as saídas estão
+# completas e as entradas só contam mães residentes nas UFs carregadas.
+
+# Colunas do SINASC necessárias para os fluxos
+COLUNAS_FLUXOS = ['UF', 'DTNASC', 'PESO', 'CODMUNNASC', 'CODMUNRES']
+
+# Chaves das contagens dos fluxos
+CHAVES_FLUXOS = ['CODMUNRES', 'CODMUNNASC', 'Ano', 'BAIXO_PESO']
+
+# Sentidos das consultas de ranking: saídas (residentes que deram à luz em outro
+# município) e entradas (partos de mães residentes em outro município)
+SENTIDOS = ['saidas', 'entradas']
+
+
+# Função para contar os nascimentos por (residência, parto, ano, baixo peso). Só
+# entram os registros com os dois municípios e o ano preenchidos.
+def contar_fluxos(df):
+    ano = df['Ano'] if 'Ano' in df else converter_dtnasc(df['DTNASC'])[1]
+    peso = converter_peso(df['PESO']).to_numpy(dtype='float64')
+    residencia = converter_codigo_municipio(df['CODMUNRES'])
+    parto = converter_codigo_municipio(df['CODMUNNASC'])
+
+    completo = ano.notna().to_numpy() & residencia.notna().to_numpy() & parto.notna().to_numpy()
+    return pd.DataFrame({
+        'CODMUNRES': residencia[completo],
+        'CODMUNNASC': parto[completo],
+        'Ano': ano[completo].astype('Int16'),
+        'BAIXO_PESO': (peso[completo] > 0) & (peso[completo] < 2500),
+    }).groupby(CHAVES_FLUXOS, observed=True).size().reset_index(name='N')
+
+
+# Função para carregar as contagens dos fluxos das UFs em uma passada pelos dados,
+# em lotes (lotes_por_uf: o dataset Parquet ou, sem ele, os CSVs)
+def carregar_contagens_fluxos(ufs, diretorio_parquet, diretorio_csv, tamanho_lote=TAMANHO_LOTE_LEITURA):
+    lotes = lotes_por_uf(ufs, COLUNAS_FLUXOS, diretorio_parquet, diretorio_csv, tamanho_lote)
+    return somar_contagens((contar_fluxos(lote) for lote in lotes), CHAVES_FLUXOS, ('CODMUNRES', 'CODMUNNASC'))
+
+
+# Matrizes esparsas dos fluxos (residência x parto) por ano, total e baixo peso
+class MatrizFluxos:
+    def __init__(self, contagens):
+        residencia = contagens['CODMUNRES'].astype(str)
+        parto = contagens['CODMUNNASC'].astype(str)
+        self.municipios = sorted(set(residencia.unique()) | set(parto.unique()))
+        self.posicoes = {codigo: i for i, codigo in enumerate(self.municipios)}
+        anos = contagens['Ano'].astype(int).to_numpy()
+        self.anos = sorted(np.unique(anos).tolist())
+
+        # Códigos dos dois municípios no mesmo índice (linhas e colunas)
+        categorias = pd.CategoricalDtype(self.municipios)
+        linhas = residencia.astype(categorias).cat.codes.to_numpy()
+        colunas = parto.astype(categorias).cat.codes.to_numpy()
+        quantidades = contagens['N'].to_numpy(dtype='int64')
+        baixo_peso = contagens['BAIXO_PESO'].to_numpy(dtype=bool)
+        formato = (len(self.municipios), len(self.municipios))
+        self.total, self.baixo_peso = {}, {}
+        for ano in self.anos:
+            do_ano = anos == ano
+            self.total[ano] = sparse.csr_matrix((quantidades[do_ano], (linhas[do_ano], colunas[do_ano])), shape=formato)
+            so_baixo_peso = do_ano & baixo_peso
+            self.baixo_peso[ano] = sparse.csr_matrix((quantidades[so_baixo_peso], (linhas[so_baixo_peso], colunas[so_baixo_peso])), shape=formato)
+
+    # Matrizes (total, baixo peso) somadas nos anos escolhidos (None = todos)
+    def selecionar(self, anos=None):
+        anos = self.anos if anos is None else [int(ano) for ano in anos if int(ano) in self.total]
+        if not anos:
+            vazia = sparse.csr_matrix((len(self.municipios), len(self.municipios)), dtype='int64')
+            return vazia, vazia
+        return sum(self.total[ano] for ano in anos), sum(self.baixo_peso[ano] for ano in anos)
+
+    # Resumo por município: partos de residentes no próprio município, saídas
+    # (residentes que deram à luz fora) e entradas (partos de não residentes),
+    # com o baixo peso de cada grupo
+    def resumo(self, anos=None):
+        total, baixo_peso = self.selecionar(anos)
+        local_total, local_bp = total.diagonal(), baixo_peso.diagonal()
+        resumo = pd.DataFrame({
+            'Municipio': self.municipios,
+            'Partos no Município de Residência': local_total,
+            'Saídas': np.asarray(total.sum(axis=1)).ravel() - local_total,
+            'Saídas Abaixo do Peso': np.asarray(baixo_peso.sum(axis=1)).ravel() - local_bp,
+            'Entradas': np.asarray(total.sum(axis=0)).ravel() - local_total,
+            'Entradas Abaixo do Peso': np.asarray(baixo_peso.sum(axis=0)).ravel() - local_bp,
+        })
+        residentes = resumo['Partos no Município de Residência'] + resumo['Saídas']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resumo['Saídas (%)'] = np.where(residentes > 0, resumo['Saídas'] / residentes * 100, np.nan)
+            for sentido in ('Saídas', 'Entradas'):
+                resumo[f'Taxa Abaixo do Peso nas {sentido} (%)'] = np.where(
+                    resumo[sentido] > 0, resumo[f'{sentido} Abaixo do Peso'] / resumo[sentido] * 100, np.nan)
+        return resumo
+
+    # Os k municípios com mais saídas ou entradas (sentido em SENTIDOS)
+    def ranking(self, sentido='entradas', k=10, anos=None):
+        coluna = 'Saídas' if sentido == 'saidas' else 'Entradas'
+        resumo = self.resumo(anos)
+        return resumo[resumo[coluna] > 0].nlargest(k, coluna).reset_index(drop=True)
+
+    # Os k maiores fluxos entre municípios diferentes, opcionalmente só os que saem
+    # de uma residência (origem) ou chegam a um município de parto (destino)
+    def principais_fluxos(self, k=20, anos=None, origem=None, destino=None):
+        total, baixo_peso = self.selecionar(anos)
+
+        # Só as entradas preenchidas fora da diagonal (e da origem/destino pedidos)
+        total = total.tocoo()
+        mantidas = total.row != total.col
+        for codigo, eixo in ((origem, total.row), (destino, total.col)):
+            if codigo is not None:
+                mantidas &= eixo == self.posicoes.get(str(codigo), -1)
+        linhas, colunas, quantidades = total.row[mantidas], total.col[mantidas], total.data[mantidas]
+        if len(quantidades) > k:
+            maiores = np.argpartition(-quantidades, k - 1)[:k]
+            linhas, colunas, quantidades = linhas[maiores], colunas[maiores], quantidades[maiores]
+        ordem = np.lexsort((colunas, linhas, -quantidades))
+        linhas, colunas, quantidades = linhas[ordem], colunas[ordem], quantidades[ordem]
+
+        municipios = np.array(self.municipios, dtype=object)
+        fluxos = pd.DataFrame({
+            'CODMUNRES': municipios[linhas],
+            'CODMUNNASC': municipios[colunas],
+            'Nascimentos': quantidades.astype('int64'),
+            'Nascimentos Abaixo do Peso': np.asarray(baixo_peso[linhas, colunas]).ravel().astype('int64') if len(linhas) else np.zeros(0, dtype='int64'),
+        })
+        fluxos['Taxa de Nascimento Abaixo do Peso (%)'] = fluxos['Nascimentos Abaixo do Peso'] / fluxos['Nascimentos'] * 100
+        return fluxos
@@ -0,0 +1,132 @@
+import os
+import json
+import argparse
+import numpy as np
+import shapely
+
+# Tolerâncias de simplificação (em graus; 0.001° ≈ 110 m) por nível de detalhe do mapa
+TOLERANCIAS = {
+    'detalhado': 0.0005,
+    'medio': 0.002,
+    'leve': 0.008,
+}
+NIVEL_PADRAO = 'medio'
+
+# Casas decimais das coordenadas no GeoJSON em cache (5 casas ≈ 1 m)
+CASAS_DECIMAIS = 5
+
+# Diretório padrão do cache de geometrias simplificadas
+diretorio_cache_geometria = os.path.join(os.getcwd(), 'cache_geometria')
+
+# Diretório e padrão de nome dos shapefiles de municípios por UF (malha do IBGE)
+diretorio_shapefile = os.path.join(os.getcwd(), 'shapefile')
+PADRAO_SHAPEFILE = '{uf}_Municipios_2022.shp'
+
+
+# Função para simplificar as geometrias preservando a topologia entre vizinhos.
+# coverage_simplify (shapely >= 2.1) simplifica cada fronteira compartilhada uma
+# única vez, então municípios vizinhos continuam encaixados, sem buracos nem
+# sobreposições; nas versões antigas cai no simplify por polígono.
+def simplificar_geometrias(geometrias, tolerancia):
+    geometrias = np.asarray(geometrias)
+    if hasattr(shapely, 'coverage_simplify'):
+        return shapely.coverage_simplify(geometrias, tolerancia)
+    return shapely.simplify(geometrias, tolerancia, preserve_topology=True)
+
+
+# Função para montar um GeoJSON compacto (id = CD_MUN, coordenadas arredondadas)
+def montar_geojson(gdf, geometrias):
+    geometrias = shapely.transform(geometrias, lambda coordenadas: np.round(coordenadas, CASAS_DECIMAIS))
+    features = []
+    for codigo, nome, geometria in zip(gdf['CD_MUN'].astype(str), gdf['NM_MUN'], geometrias):
+        features.append({
+            'type': 'Feature',
+            'id': codigo,
+            'properties': {'NM_MUN': nome},
+            'geometry': json.loads(shapely.to_geojson(geometria)),
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+# Função para montar o caminho do GeoJSON simplificado em cache
+def caminho_cache(caminho_fonte, nivel, diretorio_cache=None):
+    nome_base = os.path.splitext(os.path.basename(caminho_fonte))[0]
+    return os.path.join(diretorio_cache or diretorio_cache_geometria, f'{nome_base}_{nivel}.geojson')
+
+
+# Função para gerar as versões simplificadas (todos os níveis) a partir do shapefile
+def gerar_geometrias_simplificadas(caminho_fonte, diretorio_cache=None):
+    import geopandas as gpd
+
+    gdf = gpd.read_file(caminho_fonte)
+    # Código e nome dos municípios (usados em montar_geojson) vêm da tabela .dbf
+    ausentes = [coluna for coluna in ('CD_MUN', 'NM_MUN') if coluna not in gdf.columns]
+    if ausentes:
+        raise ValueError(f'Shapefile {caminho_fonte} sem as colunas {", ".join(ausentes)}: '
+                         f'verifique o arquivo {os.path.splitext(caminho_fonte)[0]}.dbf')
+    if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(4326)  # O Plotly espera longitude/latitude em WGS84
+
+    gerados = {}
+    for nivel, tolerancia in TOLERANCIAS.items():
+        geojson = montar_geojson(gdf, simplificar_geometrias(gdf.geometry.values, tolerancia))
+        caminho = caminho_cache(caminho_fonte, nivel, diretorio_cache)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(geojson, arquivo, ensure_ascii=False, separators=(',', ':'))
+        gerados[nivel] = caminho
+    return gerados
+
+
+# Função para carregar o GeoJSON simplificado de um nível, gerando o cache em
+# disco se ele não existir ou estiver mais velho que o arquivo de origem
+def carregar_geojson_simplificado(caminho_fonte, nivel=NIVEL_PADRAO, diretorio_cache=None):
+    caminho = caminho_cache(caminho_fonte, nivel, diretorio_cache)
+    if not os.path.exists(caminho) or os.path.getmtime(caminho) < os.path.getmtime(caminho_fonte):
+        gerar_geometrias_simplificadas(caminho_fonte, diretorio_cache)
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+# Função para montar o caminho do shapefile de municípios de uma UF
+def caminho_shapefile_uf(uf, diretorio=None):
+    return os.path.join(diretorio or diretorio_shapefile, PADRAO_SHAPEFILE.format(uf=uf))
+
+
+# Função para juntar os GeoJSON simplificados de várias UFs em um só.
+# UFs sem shapefile no diretório são ignoradas e devolvidas em 'faltando'.
+def carregar_geojson_ufs(ufs, nivel=NIVEL_PADRAO, diretorio=None, diretorio_cache=None):
+    features = []
+    faltando = []
+    for uf in ufs:
+        caminho_fonte = caminho_shapefile_uf(uf, diretorio)
+        if not os.path.exists(caminho_fonte):
+            faltando.append(uf)
+            continue
+        features.extend(carregar_geojson_simplificado(caminho_fonte, nivel, diretorio_cache)['features'])
+    return {'type': 'FeatureCollection', 'features': features}, faltando
+
+
+# Função para obter um ponto de cada município do GeoJSON (ponto interno ao polígono,
+# que ao contrário do centroide nunca cai fora de municípios côncavos), para os
+# mapas de fluxo
+def pontos_municipios(geojson):
+    geometrias = shapely.from_geojson([json.dumps(feature['geometry']) for feature in geojson['features']])
+    pontos = shapely.point_on_surface(geometrias)
+    return {
+        'codigo': [str(feature['id']) for feature in geojson['features']],
+        'nome': [feature['properties']['NM_MUN'] for feature in geojson['features']],
+        'lon': shapely.get_x(pontos),
+        'lat': shapely.get_y(pontos),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera as geometrias simplificadas dos municípios para o mapa.')
+    parser.add_argument('--shapefile', nargs='+', default=[caminho_shapefile_uf('PB')],
+                        help='Um ou mais shapefiles (ex.: shapefile/*_Municipios_2022.shp)')
+    parser.add_argument('--cache', default=diretorio_cache_geometria)
+    args = parser.parse_args()
+    for shapefile in args.shapefile:
+        for nivel, caminho in gerar_geometrias_simplificadas(shapefile, args.cache).items():
+            print(f'{nivel}: {caminho} ({os.path.getsize(caminho) / 1024:.0f} KB)')
@@ -0,0 +1,120 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Construção das figuras do dashboard, sem Streamlit (usada pelo app, pelo
+# benchmark e por scripts headless)
+
+
+# Função para criar o gráfico de linha da evolução dos nascimentos por ano
+def figura_nascimentos_por_ano(df_combined):
+    return px.line(df_combined, x='Ano', y=['Total_Nascimentos', 'Total_Baixo_Peso'],
+                   title='Evolução do Número de Nascimentos ao Longo dos Anos',
+                   labels={'value': 'Total', 'Ano': 'Ano'},
+                   markers=True)
+
+
+# Função para mesclar os municípios do GeoJSON com as métricas por município
+def dados_mapa(geojson, merged):
+    gdf_merged = pd.DataFrame({
+        'CODMUNNASC': [feature['id'] for feature in geojson['features']],
+        'NM_MUN': [feature['properties']['NM_MUN'] for feature in geojson['features']],
+    })
+    merged = merged.assign(CODMUNNASC=merged['CODMUNNASC'].astype(str))
+    return gdf_merged.merge(merged, on='CODMUNNASC', how='left')
+
+
+# Função para criar o mapa (choropleth) da taxa de baixo peso por município
+def figura_mapa(gdf_merged, geojson, titulo):
+    fig = px.choropleth(
+        gdf_merged,
+        geojson=geojson,
+        locations='CODMUNNASC',
+        featureidkey='id',
+        color='Taxa_Abaixo_Peso',  # Usar a taxa de nascimentos abaixo do peso
+        hover_name='NM_MUN',
+        hover_data=['Nascimentos_Abaixo_Peso', 'Total_Nascimentos'],
+        color_continuous_scale=px.colors.sequential.YlOrRd,  # Amarelo para vermelho
+        labels={'Taxa_Abaixo_Peso': 'Taxa de Nascimentos Abaixo do Peso (%)'}
+    )
+
+    # Ajustes para o gráfico
+    fig.update_geos(
+        fitbounds="locations",
+        visible=False,
+        bgcolor='rgba(0,0,0,0)')  #transparente
+
+    # Ajusta o mapa
+    fig.update_layout(
+        height=600,
+        title_text=titulo,
+        paper_bgcolor='rgba(0,0,0,0)',  # Fundo do gráfico transparente
+        plot_bgcolor='rgba(0,0,0,0)',    # Fundo da área de plotagem transparente
+        coloraxis_colorbar=dict(title="Nascimentos Abaixo do Peso (%)")  # Título da barra de cores
+    )
+    return fig
+
+
+# Função para criar o gráfico de barras comparativo entre municípios
+def figura_comparativa(df_metricas):
+    return px.bar(df_metricas, x='Municipio',
+                  y=['Nascimentos Abaixo do Peso', 'Total de Nascimentos'],
+                  title='Comparativo de Nascimentos Abaixo do Peso por Município')
+
+
+# Função para criar o gráfico da taxa de baixo peso por ano de cada município comparado
+def figura_comparativa_por_ano(df_por_ano):
+    return px.line(df_por_ano, x='Ano', y='Taxa de Nascimento Abaixo do Peso (%)', color='Municipio',
+                   hover_data=['Nascimentos Abaixo do Peso', 'Total de Nascimentos'],
+                   title='Taxa de Nascimentos Abaixo do Peso por Ano',
+                   markers=True)
+
+
+# Função para criar o gráfico das razões de chances ajustadas por fator (com IC 95%,
+# escala logarítmica), um ponto por grupo
+def figura_razoes_de_chances(razoes):
+    razoes = razoes.dropna(subset=['OR ajustada'])
+    fig = px.scatter(razoes, x='OR ajustada', y='Fator', color='Grupo', log_x=True,
+                     error_x=razoes['IC 95% sup (ajustada)'] - razoes['OR ajustada'],
+                     error_x_minus=razoes['OR ajustada'] - razoes['IC 95% inf (ajustada)'],
+                     hover_data=['OR bruta'],
+                     title='Razões de Chances Ajustadas de Baixo Peso ao Nascer (IC 95%)')
+    fig.add_vline(x=1, line_dash='dash', line_color='gray')
+    return fig
+
+
+# Função para criar o mapa de fluxos residência → parto: uma linha por fluxo, com a
+# espessura proporcional aos nascimentos, e os municípios de parto marcados.
+# pontos: codigo, nome, lon e lat de cada município (geometria.pontos_municipios);
+# fluxos com algum município sem ponto (fora das UFs do mapa) ficam de fora.
+def figura_fluxos(fluxos, pontos, titulo):
+    pontos = pd.DataFrame(pontos).set_index('codigo')
+    fluxos = fluxos[fluxos['CODMUNRES'].isin(pontos.index) & fluxos['CODMUNNASC'].isin(pontos.index)]
+    origem, destino = pontos.loc[fluxos['CODMUNRES']], pontos.loc[fluxos['CODMUNNASC']]
+    maximo = fluxos['Nascimentos'].max() if len(fluxos) else 1
+
+    fig = go.Figure()
+    for i in range(len(fluxos)):
+        fluxo = fluxos.iloc[i]
+        fig.add_trace(go.Scattergeo(
+            lon=[origem['lon'].iloc[i], destino['lon'].iloc[i]],
+            lat=[origem['lat'].iloc[i], destino['lat'].iloc[i]],
+            mode='lines',
+            line=dict(width=1 + 7 * fluxo['Nascimentos'] / maximo, color='rgba(200, 60, 40, 0.6)'),
+            hoverinfo='text',
+            text=(f"{origem['nome'].iloc[i]} → {destino['nome'].iloc[i]}: {fluxo['Nascimentos']} nascimentos, "
+                  f"{fluxo['Nascimentos Abaixo do Peso']} abaixo do peso"),
+            showlegend=False,
+        ))
+
+    # Municípios de parto (destinos) e de residência (origens)
+    for pontos_fluxo, nome, cor in ((origem, 'Residência', 'steelblue'), (destino, 'Parto', 'darkred')):
+        pontos_fluxo = pontos_fluxo[~pontos_fluxo.index.duplicated()]
+        fig.add_trace(go.Scattergeo(lon=pontos_fluxo['lon'], lat=pontos_fluxo['lat'], mode='markers',
+                                    marker=dict(size=6, color=cor), text=pontos_fluxo['nome'],
+                                    hoverinfo='text', name=nome))
+
+    fig.update_geos(fitbounds="locations", visible=False, showland=True, landcolor='rgb(235, 235, 235)',
+                    bgcolor='rgba(0,0,0,0)')
+    fig.update_layout(height=600, title_text=titulo, paper_bgcolor='rgba(0,0,0,0)')
+    return fig
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+
+# Instrumentação de tempo e memória das etapas de uma execução do dashboard.
+# Desligada, etapa() devolve um contexto nulo compartilhado: o custo é uma
+# chamada de função e um teste de flag. Ligada, cada etapa registra o tempo de
+# parede, o RSS no fim e a variação de RSS, com uma categoria (io, pandas,
+# plotly...) para separar onde o tempo vai.
+
+# Variáveis de ambiente: liga a instrumentação e define o arquivo JSON lines
+VARIAVEL_ATIVAR = 'BPN_DIAGNOSTICO'
+VARIAVEL_LOG = 'BPN_DIAGNOSTICO_LOG'
+
+_ativo = os.environ.get(VARIAVEL_ATIVAR, '').lower() in ('1', 'true', 'sim')
+_contexto_nulo = nullcontext()
+_local = threading.local()
+
+
+# Função para ler o RSS atual do processo (Linux); None em outros sistemas
+def rss_atual():
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+# Função para ligar/desligar a instrumentação (padrão do processo; scripts e benchmark)
+def ativar(ligado=True):
+    global _ativo
+    _ativo = bool(ligado)
+
+
+# Função para saber se a instrumentação está ligada na execução atual
+def ativo():
+    return getattr(_local, 'ativo', _ativo)
+
+
+# Função para iniciar o registro de uma nova execução (um rerun do Streamlit).
+# Os registros (e o liga/desliga) ficam por thread, então sessões simultâneas
+# não se misturam; ligado=None segue o padrão do processo.
+def iniciar_execucao(ligado=None):
+    _local.ativo = _ativo if ligado is None else bool(ligado)
+    _local.registros = []
+    _local.nivel = 0
+    _local.inicio = time.perf_counter()
+
+
+# Função para obter os registros da execução atual
+def registros():
+    return list(getattr(_local, 'registros', []))
+
+
+# Função para obter o tempo decorrido (s) desde o início da execução atual
+def duracao_execucao():
+    inicio = getattr(_local, 'inicio', None)
+    return None if inicio is None else time.perf_counter() - inicio
+
+
+# Contexto que mede uma etapa quando a instrumentação está ligada
+class _Etapa:
+    __slots__ = ('nome', 'categoria', 'inicio', 'rss_inicial')
+
+    def __init__(self, nome, categoria):
+        self.nome = nome
+        self.categoria = categoria
+
+    def __enter__(self):
+        if not hasattr(_local, 'registros'):
+            iniciar_execucao()
+        _local.nivel += 1
+        self.rss_inicial = rss_atual()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_erro, erro, rastreamento):
+        segundos = time.perf_counter() - self.inicio
+        rss_final = rss_atual()
+        _local.nivel -= 1
+        _local.registros.append({
+            'etapa': self.nome,
+            'categoria': self.categoria,
+            'nivel': _local.nivel,
+            'inicio_s': round(self.inicio - _local.inicio, 4),
+            'segundos': round(segundos, 4),
+            'rss_mb': None if rss_final is None else round(rss_final / 2**20, 1),
+            'delta_rss_mb': None if rss_final is None or self.rss_inicial is None else round((rss_final - self.rss_inicial) / 2**20, 1),
+            'erro': None if tipo_erro is None else tipo_erro.__name__,
+        })
+        return False
+
+
+# Função para medir uma etapa: `with etapa('load_data', 'io'): ...`
+def etapa(nome, categoria='pandas'):
+    if not getattr(_local, 'ativo', _ativo):
+        return _contexto_nulo
+    return _Etapa(nome, categoria)
+
+
+# Função para converter os registros da execução em JSON lines (um objeto por etapa)
+def registros_jsonl(registros_execucao, **contexto):
+    data = datetime.now().isoformat(timespec='milliseconds')
+    return ''.join(json.dumps({'data': data, **contexto, **registro}, ensure_ascii=False) + '\n'
+                   for registro in registros_execucao)
+
+
+# Função para acrescentar os registros da execução ao arquivo JSON lines
+# (caminho explícito ou a variável de ambiente BPN_DIAGNOSTICO_LOG)
+def exportar_jsonl(registros_execucao, caminho=None, **contexto):
+    caminho = caminho or os.environ.get(VARIAVEL_LOG)
+    if not caminho or not registros_execucao:
+        return None
+    with open(caminho, 'a', encoding='utf-8') as arquivo:
+        arquivo.write(registros_jsonl(registros_execucao, **contexto))
+    return caminho
@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+# Manifesto de ingestão do dataset Parquet: um JSON por linha, só acrescentado,
+# com o arquivo de origem (CSV/DBF), o checksum e a partição gerada. A última
+# linha de cada arquivo vale; as anteriores ficam como histórico. O prefixo '_'
+# faz o pyarrow.dataset ignorá-lo ao ler as partições.
+ARQUIVO_MANIFESTO = '_manifesto.jsonl'
+
+# Tamanho do bloco de leitura no cálculo do checksum
+TAMANHO_BLOCO_CHECKSUM = 1 << 20
+
+
+# Função para calcular o SHA-256 de um arquivo, lendo em blocos
+def checksum_arquivo(caminho):
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_CHECKSUM), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+# Função para montar o caminho do manifesto dentro do dataset Parquet
+def caminho_manifesto(diretorio_parquet):
+    return os.path.join(diretorio_parquet, ARQUIVO_MANIFESTO)
+
+
+# Função para ler o manifesto: dicionário arquivo → última entrada registrada
+def ler_manifesto(diretorio_parquet):
+    caminho = caminho_manifesto(diretorio_parquet)
+    entradas = {}
+    if not os.path.exists(caminho):
+        return entradas
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            if linha.strip():
+                entrada = json.loads(linha)
+                entradas[entrada['arquivo']] = entrada
+    return entradas
+
+
+# Função para acrescentar uma entrada ao manifesto
+def registrar_ingestao(diretorio_parquet, entrada):
+    os.makedirs(diretorio_parquet, exist_ok=True)
+    entrada = {**entrada, 'data': datetime.now().isoformat(timespec='seconds')}
+    with open(caminho_manifesto(diretorio_parquet), 'a', encoding='utf-8') as arquivo:
+        arquivo.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+    return entrada
+
+
+# Função para verificar se a partição gerada por uma entrada do manifesto ainda existe
+def destino_existe(diretorio_parquet, entrada):
+    destino = entrada.get('destino')
+    return destino is not None and os.path.exists(os.path.join(diretorio_parquet, destino))
+
+
+# Função para listar os arquivos de origem novos ou alterados desde a última ingestão.
+# Tamanho e mtime iguais aos do manifesto bastam para pular o arquivo sem lê-lo; se
+# mudaram, o checksum decide. Arquivos cuja partição foi apagada são sempre
+# reprocessados. Não altera o manifesto: devolve os pendentes, como (arquivo,
+# caminho, entrada) com a entrada a registrar depois de gravar a partição, e as
+# entradas dos arquivos só "tocados" (mesmo checksum), a registrar sem reprocessar.
+def arquivos_pendentes(diretorio_origem, diretorio_parquet, particao_do_arquivo, extensao, forcar=False):
+    manifesto = ler_manifesto(diretorio_parquet)
+    pendentes, tocados = [], []
+    for arquivo in sorted(os.listdir(diretorio_origem)):
+        particao = particao_do_arquivo(arquivo)
+        if particao is None or not arquivo.lower().endswith(extensao):
+            continue
+        caminho = os.path.join(diretorio_origem, arquivo)
+        info = os.stat(caminho)
+        anterior = manifesto.get(arquivo)
+        if anterior is not None and not destino_existe(diretorio_parquet, anterior):
+            anterior = None
+        if not forcar and anterior is not None and (anterior['tamanho'], anterior['mtime_ns']) == (info.st_size, info.st_mtime_ns):
+            continue
+
+        entrada = {
+            'arquivo': arquivo,
+            'uf': particao[0],
+            'ano': particao[1],
+            'sha256': checksum_arquivo(caminho),
+            'tamanho': info.st_size,
+            'mtime_ns': info.st_mtime_ns,
+        }
+        if not forcar and anterior is not None and anterior['sha256'] == entrada['sha256']:
+            tocados.append({**anterior, **entrada})
+            continue
+        pendentes.append((arquivo, caminho, entrada))
+    return pendentes, tocados
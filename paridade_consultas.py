@@ -0,0 +1,118 @@
+import os
+import sys
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from armazenamento import DTYPES_CSV, ingerir_csv_para_parquet, lotes_por_uf
+from benchmark import gerar_bloco_sinasc
+from consultas import ConsultasCubo, ConsultasDuckDB
+from cubo import COLUNAS_CUBO, combinar_cubos, construir_cubo, ler_cubo, restringir_ufs
+
+# Verificação headless de que os dois motores de consultas (consultas.py) dão as
+# mesmas respostas: o cubo em memória (pandas) e o SQL sobre os arquivos (DuckDB).
+# Os dados são sintéticos (os do benchmark.py, com nulos, idade 99 e partos em
+# outras UFs), gravados como CSVs DN<UF><ANO> e ingeridos no dataset Parquet. Cada
+# par de motores lê a mesma origem: o cubo do dataset x DuckDB sobre o dataset e o
+# cubo dos CSVs x DuckDB sobre os CSVs.
+
+# Arquivos sintéticos: UF, ano e prefixo dos códigos de município
+ARQUIVOS_SINTETICOS = [('PB', 2000, '25'), ('PB', 2001, '25'), ('PE', 2001, '26')]
+
+# Seleções de UFs e faixas de idade consultadas
+SELECOES_UFS = [('PB',), ('PB', 'PE')]
+FAIXAS_IDADE = [None, (20, 30), (12, 19)]
+
+# Município sem registros, para conferir as linhas zeradas das comparações
+MUNICIPIO_SEM_REGISTROS = '2599999'
+
+
+# Função para gravar os CSVs sintéticos DN<UF><ANO> (datas dentro do ano do arquivo)
+def gerar_csvs_sinteticos(diretorio_csv, n, semente=0):
+    rng = np.random.default_rng(semente)
+    os.makedirs(diretorio_csv, exist_ok=True)
+    for uf, ano, prefixo in ARQUIVOS_SINTETICOS:
+        bloco = gerar_bloco_sinasc(n, rng, anos=(ano, ano))
+        for coluna in ('CODMUNNASC', 'CODMUNRES'):
+            bloco[coluna] = bloco[coluna].str.replace(r'^25', prefixo, regex=True)
+        bloco.to_csv(os.path.join(diretorio_csv, f'DN{uf}{ano}.csv'), index=False)
+
+
+# Função para deixar uma resposta comparável: códigos como texto, números como
+# float64 e linhas ordenadas pelas chaves
+def normalizar(df, chaves):
+    df = df.reset_index(drop=True).copy()
+    for coluna in df:
+        df[coluna] = df[coluna].astype(str) if coluna == 'CODMUNNASC' else df[coluna].astype('float64')
+    return df.sort_values(chaves, ignore_index=True)
+
+
+# Função para comparar as respostas de dois motores; devolve as divergências
+def comparar_motores(referencia, outro):
+    divergencias = []
+
+    def conferir(consulta, comparacao):
+        try:
+            comparacao()
+        except AssertionError as e:
+            divergencias.append(f'{consulta}: {e}')
+
+    conferir('faixa_idade', lambda: np.testing.assert_equal(referencia.faixa_idade(), outro.faixa_idade()))
+    conferir('municipios', lambda: np.testing.assert_equal(sorted(referencia.municipios()), sorted(outro.municipios())))
+    for faixa in FAIXAS_IDADE:
+        conferir(f'metricas{faixa}', lambda: np.testing.assert_allclose(
+            np.array(referencia.metricas(faixa), dtype=float), np.array(outro.metricas(faixa), dtype=float)))
+        conferir(f'nascimentos_por_ano{faixa}', lambda: pd.testing.assert_frame_equal(
+            normalizar(referencia.nascimentos_por_ano(faixa), ['Ano']), normalizar(outro.nascimentos_por_ano(faixa), ['Ano'])))
+    conferir('taxa_por_municipio', lambda: pd.testing.assert_frame_equal(
+        normalizar(referencia.taxa_por_municipio(), ['CODMUNNASC']), normalizar(outro.taxa_por_municipio(), ['CODMUNNASC'])))
+
+    # Os maiores municípios, um pequeno e um sem registros
+    municipios = sorted(referencia.municipios())
+    codigos = municipios[:3] + municipios[-1:] + [MUNICIPIO_SEM_REGISTROS]
+    conferir('comparar_municipios', lambda: pd.testing.assert_frame_equal(
+        normalizar(referencia.comparar_municipios(codigos), ['CODMUNNASC']),
+        normalizar(outro.comparar_municipios(codigos), ['CODMUNNASC'])))
+    conferir('comparar_municipios_por_ano', lambda: pd.testing.assert_frame_equal(
+        normalizar(referencia.comparar_municipios_por_ano(codigos), ['CODMUNNASC', 'Ano']),
+        normalizar(outro.comparar_municipios_por_ano(codigos), ['CODMUNNASC', 'Ano'])))
+    return divergencias
+
+
+# Função para gerar os dados, montar os dois pares de motores e comparar cada seleção
+# de UFs. Devolve o total de divergências.
+def verificar_paridade(n, diretorio, semente=0):
+    diretorio_csv = os.path.join(diretorio, 'csv')
+    diretorio_parquet = os.path.join(diretorio, 'parquet')
+    sem_parquet = os.path.join(diretorio, 'sem_parquet')
+    gerar_csvs_sinteticos(diretorio_csv, n, semente)
+    ingerir_csv_para_parquet(diretorio_csv, diretorio_parquet)
+
+    cubo_dataset = ler_cubo(diretorio_parquet)
+    cubo_csv = combinar_cubos(construir_cubo(df) for df in lotes_por_uf(
+        [uf for uf, _, _ in ARQUIVOS_SINTETICOS], COLUNAS_CUBO, None, diretorio_csv, None, DTYPES_CSV))
+
+    total = 0
+    for ufs in SELECOES_UFS:
+        pares = [
+            ('dataset', ConsultasCubo(restringir_ufs(cubo_dataset, ufs)), ConsultasDuckDB(ufs, diretorio_parquet, diretorio_csv)),
+            ('csv', ConsultasCubo(restringir_ufs(cubo_csv, ufs)), ConsultasDuckDB(ufs, sem_parquet, diretorio_csv)),
+        ]
+        for origem, cubo, duckdb in pares:
+            divergencias = comparar_motores(cubo, duckdb)
+            print(f'{",".join(ufs):6} {origem:8} {"ok" if not divergencias else f"{len(divergencias)} divergência(s)"}')
+            for divergencia in divergencias:
+                print(f'  {divergencia}')
+            total += len(divergencias)
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Confere se os motores pandas (cubo) e DuckDB dão as mesmas respostas.')
+    parser.add_argument('--registros', type=int, default=50_000, help='Registros por arquivo sintético')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        divergencias = verificar_paridade(args.registros, diretorio, args.semente)
+    sys.exit(1 if divergencias else 0)
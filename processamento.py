@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+# Tipos compactos usados pelo pré-processamento. Comparados às colunas object
+# (strings do CSV), reduzem a memória por registro em cerca de 10x.
+TIPOS_COMPACTOS = {
+    'PESO': 'float32',
+    'IDADEMAE': 'UInt8',
+    'CODMUNNASC': 'category',
+    'CODMUNRES': 'category',
+    'Ano': 'Int16',
+    'Mes': 'Int8',
+}
+
+
+# Função para verificar se uma coluna já está no tipo compacto
+def _tipo_compacto(serie, tipo):
+    if tipo == 'category':
+        return isinstance(serie.dtype, pd.CategoricalDtype)
+    return serie.dtype == pd.api.types.pandas_dtype(tipo)
+
+
+# Função para verificar se o DataFrame já foi pré-processado
+def ja_preprocessado(df):
+    return all(coluna in df and _tipo_compacto(df[coluna], tipo) for coluna, tipo in TIPOS_COMPACTOS.items() if coluna != 'CODMUNRES')
+
+
+# Função para converter uma coluna de strings analisando só os valores distintos.
+# Datas, pesos e idades repetem muito (centenas/milhares de valores distintos em
+# milhões de linhas), então o parse caro roda sobre os únicos e o resultado é
+# espalhado de volta pelas linhas com um take vetorizado.
+def converter_por_valores_unicos(serie, conversor):
+    codigos, unicos = pd.factorize(serie)
+    convertidos = np.append(conversor(pd.Series(unicos)).to_numpy(dtype='float64'), np.nan)
+    return pd.Series(convertidos[codigos], index=serie.index)
+
+
+# Função para converter DTNASC (string DDMMAAAA, número ou data) em datetime, ano e mês
+def converter_dtnasc(serie):
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        datas = serie
+    else:
+        # Aritmética inteira sobre DDMMAAAA: evita o parse de data linha a linha
+        if pd.api.types.is_numeric_dtype(serie):
+            valores = serie.to_numpy(dtype='float64')
+        else:
+            valores = converter_por_valores_unicos(serie, lambda unicos: pd.to_numeric(unicos, errors='coerce')).to_numpy()
+        valido = np.isfinite(valores)
+        inteiros = np.where(valido, valores, 0).astype('int64')
+        datas = pd.to_datetime(
+            pd.DataFrame({
+                'year': np.where(valido, inteiros % 10000, 0),
+                'month': np.where(valido, inteiros // 10000 % 100, 0),
+                'day': np.where(valido, inteiros // 1000000, 0),
+            }),
+            errors='coerce',
+        )
+        datas.index = serie.index
+    return datas, datas.dt.year.astype('Int16'), datas.dt.month.astype('Int8')
+
+
+# Função para converter PESO (aceita vírgula decimal) em float32
+def converter_peso(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float32')
+    return converter_por_valores_unicos(
+        serie,
+        lambda unicos: pd.to_numeric(unicos.astype(str).str.replace(',', '.', regex=False).str.strip(), errors='coerce'),
+    ).astype('float32')
+
+
+# Função para converter IDADEMAE em inteiro sem sinal de 8 bits (nulo quando inválida)
+def converter_idade(serie):
+    if pd.api.types.is_numeric_dtype(serie):
+        idade = serie.astype('float64')
+    else:
+        idade = converter_por_valores_unicos(serie, lambda unicos: pd.to_numeric(unicos, errors='coerce'))
+    idade = idade.where((idade >= 0) & (idade <= 255))
+    return idade.astype('float64').round().astype('UInt8')
+
+
+# Função para converter um código de município em categoria de strings
+def converter_codigo_municipio(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    if pd.api.types.is_numeric_dtype(serie):
+        serie = serie.astype('Int64').astype('string')
+    return serie.astype('category')
+
+
+# Função para converter as colunas do SINASC para os tipos compactos, in-place e
+# em uma única passada vetorizada. É idempotente: colunas já convertidas não são
+# tocadas de novo, então chamadas repetidas não custam nada.
+def converter_tipos(df):
+    if ja_preprocessado(df):
+        return df
+    if not _tipo_compacto(df.get('Ano', pd.Series(dtype='float64')), 'Int16'):
+        df['DTNASC'], df['Ano'], df['Mes'] = converter_dtnasc(df['DTNASC'])
+    if not _tipo_compacto(df['PESO'], 'float32'):
+        df['PESO'] = converter_peso(df['PESO'])
+    if not _tipo_compacto(df['IDADEMAE'], 'UInt8'):
+        df['IDADEMAE'] = converter_idade(df['IDADEMAE'])
+    for coluna in ('CODMUNNASC', 'CODMUNRES'):
+        if coluna in df:
+            df[coluna] = converter_codigo_municipio(df[coluna])
+    return df
+
+
+# Função para montar a máscara dos códigos de município que pertencem à(s) UF(s)
+# (prefixo_uf aceita um prefixo ou uma tupla de prefixos)
+def mascara_municipios_uf(codigos, prefixo_uf):
+    if isinstance(codigos.dtype, pd.CategoricalDtype):
+        # startswith avaliado só nas categorias (centenas), não nas linhas
+        categorias_uf = np.asarray(codigos.cat.categories.astype(str).str.startswith(prefixo_uf), dtype=bool)
+        return np.append(categorias_uf, False)[codigos.cat.codes.to_numpy()]
+    return codigos.astype('string').str.startswith(prefixo_uf).fillna(False).to_numpy(dtype=bool)
+
+
+# Função para montar a máscara de nascimentos com baixo peso na(s) UF(s)
+# (prefixo_uf=None não restringe a UF do município)
+def mascara_baixo_peso(df, prefixo_uf='25'):
+    peso = df['PESO'].to_numpy()
+    mascara = (peso < 2500) & (peso > 0)
+    if prefixo_uf is None:
+        return mascara
+    return mascara & mascara_municipios_uf(df['CODMUNNASC'], prefixo_uf)
+
+
+# Função para somar contagens parciais (ex.: uma por lote lido) pelas chaves. As
+# colunas de códigos voltam a ser categorias depois do concat (lotes com categorias
+# diferentes viram object); partes vazias são ignoradas.
+def somar_contagens(partes, chaves, categorias=('CODMUNNASC',), dropna=True):
+    partes = [parte for parte in partes if parte is not None and len(parte)]
+    if not partes:
+        return None
+    contagens = pd.concat(partes, ignore_index=True)
+    for coluna in categorias:
+        contagens[coluna] = contagens[coluna].astype('category')
+    return contagens.groupby(chaves, dropna=dropna, observed=True)['N'].sum().reset_index()
+
+
+# Função para pré-processamento dos dados: converte os tipos (uma vez) e devolve
+# o subconjunto com peso abaixo de 2500g nos municípios da(s) UF(s)
+def preprocess_data(df, prefixo_uf='25'):
+    converter_tipos(df)
+    return df[mascara_baixo_peso(df, prefixo_uf)].reset_index(drop=True)
+
+
+# Função para adicionar o nome do município a partir do código, sem merge
+# (o mapeamento é feito nas categorias, não em cada linha)
+def adicionar_nome_municipio(df, municipios_mapping):
+    nomes = dict(zip(municipios_mapping['CODMUNNASC'].astype(str), municipios_mapping['Nome_Municipio']))
+    codigos = df['CODMUNNASC']
+    if not isinstance(codigos.dtype, pd.CategoricalDtype):
+        codigos = converter_codigo_municipio(codigos)
+    df['Nome_Municipio'] = codigos.map(nomes)
+    return df
+
+
+# Função para calcular métricas
+def calculate_metrics(df_total, df_baixo_peso):
+    if df_total is not None and df_baixo_peso is not None:
+        soma_total_nascidos = len(df_total)
+        soma_nascidos_abaixo_peso = len(df_baixo_peso)
+        taxa_total_pb = (soma_nascidos_abaixo_peso / soma_total_nascidos) * 100
+        media_idade_mae = df_total['IDADEMAE'].mean()
+
+        return soma_nascidos_abaixo_peso, soma_total_nascidos, taxa_total_pb, media_idade_mae
+
+    return None, None, None, None
+
+
+# Função para estimar a memória por registro de um DataFrame (em bytes)
+def memoria_por_registro(df):
+    return df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
@@ -0,0 +1,188 @@
+import os
+import html
+import argparse
+import importlib.util
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import plotly.offline
+import graficos
+from armazenamento import DTYPES_CSV, dataset_disponivel, lotes_por_uf
+from comparativo import IndiceMunicipios, comparar_municipios, comparar_municipios_por_ano
+from cubo import COLUNAS_CUBO, calcular_metricas_cubo, combinar_cubos, construir_cubo, ler_cubo, nascimentos_por_ano_cubo, restringir_ufs, taxa_por_municipio_cubo
+from geometria import NIVEL_PADRAO, TOLERANCIAS, carregar_geojson_ufs
+from ufs import UF_PADRAO, descrever_ufs, prefixos_ufs
+
+# Relatórios estáticos (HTML/PNG/CSV) para execução noturna, sem Streamlit.
+# Os dados são lidos uma única vez para o cubo de agregados (o mesmo do dashboard);
+# todas as saídas (mapa, séries, tabelas e uma página por município) saem dele,
+# e as figuras são geradas em paralelo num pool de processos.
+
+# Nome do arquivo do plotly.js compartilhado pelas páginas HTML
+ARQUIVO_PLOTLYJS = 'plotly.min.js'
+
+MODELO_HTML = '''<!DOCTYPE html>
+<html lang="pt-BR">
+<head>
+<meta charset="utf-8">
+<title>{titulo}</title>
+<script src="{plotlyjs}"></script>
+<style>body {{ font-family: sans-serif; margin: 2em; }} table {{ border-collapse: collapse; }} td, th {{ border: 1px solid #ccc; padding: 4px 8px; text-align: right; }}</style>
+</head>
+<body>
+<h1>{titulo}</h1>
+{corpo}
+</body>
+</html>
+'''
+
+
+# Função para carregar o cubo das UFs em uma única passada pelos dados: o cubo
+# gravado no dataset Parquet ou, sem ele, um cubo por CSV lido (só as colunas do cubo)
+def carregar_cubo_relatorio(ufs, diretorio_parquet, diretorio_csv):
+    cubo = ler_cubo(diretorio_parquet) if dataset_disponivel(diretorio_parquet) else None
+    if cubo is None:
+        cubo = combinar_cubos(construir_cubo(df) for df in lotes_por_uf(ufs, COLUNAS_CUBO, None, diretorio_csv, None, DTYPES_CSV))
+    if cubo is None:
+        return None
+    return restringir_ufs(cubo, ufs)
+
+
+# Função para gravar uma figura em HTML (e em PNG, se pedido) e devolver os caminhos.
+# O plotly.js não vai embutido: as páginas apontam para uma cópia única (plotlyjs).
+def gravar_figura(fig, caminho_base, plotlyjs, png=False, titulo=None, antes='', depois=''):
+    caminhos = [caminho_base + '.html']
+    with open(caminhos[0], 'w', encoding='utf-8') as arquivo:
+        arquivo.write(MODELO_HTML.format(
+            titulo=html.escape(titulo or fig.layout.title.text or ''),
+            plotlyjs=plotlyjs,
+            corpo=antes + fig.to_html(full_html=False, include_plotlyjs=False) + depois,
+        ))
+    if png:
+        fig.write_image(caminho_base + '.png', width=1200, height=700)
+        caminhos.append(caminho_base + '.png')
+    return caminhos
+
+
+# Função (executada nos processos do pool) para gerar a página de um município:
+# métricas, série anual da taxa e tabela por ano
+def relatorio_municipio(metricas, por_ano, diretorio, png=False):
+    nome = metricas['Municipio']
+    fig = graficos.figura_comparativa_por_ano(por_ano)
+    fig.update_layout(title_text=f'Taxa de Nascimentos Abaixo do Peso por Ano – {nome}')
+
+    resumo = pd.DataFrame([metricas]).drop(columns=['Municipio', 'CODMUNNASC']).to_html(index=False, float_format='{:.2f}'.format)
+    tabela = por_ano.drop(columns=['Municipio', 'CODMUNNASC']).to_html(index=False, float_format='{:.2f}'.format)
+    return gravar_figura(fig, os.path.join(diretorio, metricas['CODMUNNASC']), f'../{ARQUIVO_PLOTLYJS}', png,
+                         titulo=f"{nome} ({metricas['CODMUNNASC']})", antes=resumo, depois='<h2>Por ano</h2>' + tabela)
+
+
+# Função (executada nos processos do pool) para gerar o mapa das UFs
+def relatorio_mapa(taxa_municipios, geojson, titulo, diretorio, png=False):
+    gdf_merged = graficos.dados_mapa(geojson, taxa_municipios)
+    return gravar_figura(graficos.figura_mapa(gdf_merged, geojson, titulo), os.path.join(diretorio, 'mapa'), ARQUIVO_PLOTLYJS, png)
+
+
+# Função (executada nos processos do pool) para gerar a série anual das UFs
+def relatorio_nascimentos_por_ano(df_combined, diretorio, png=False):
+    return gravar_figura(graficos.figura_nascimentos_por_ano(df_combined), os.path.join(diretorio, 'nascimentos_por_ano'),
+                         ARQUIVO_PLOTLYJS, png)
+
+
+# Função para montar a página inicial com as métricas gerais e os links
+def gravar_indice(diretorio, nome_abrangencia, metricas_gerais, df_comparativo):
+    total_baixo_peso, total_nascidos, taxa_pb, media_idade_mae = metricas_gerais
+    links = df_comparativo.assign(Municipio=[
+        f'<a href="municipios/{codigo}.html">{html.escape(nome)}</a>'
+        for codigo, nome in zip(df_comparativo['CODMUNNASC'], df_comparativo['Municipio'])
+    ])
+    corpo = (
+        f'<p>Total de nascimentos abaixo do peso: {total_baixo_peso} &middot; Total de nascimentos: {total_nascidos} &middot; '
+        f'Nascimentos abaixo do peso: {taxa_pb:.2f}% &middot; Média da idade das mães: {media_idade_mae:.2f}</p>'
+        '<p><a href="mapa.html">Mapa por município</a> &middot; <a href="nascimentos_por_ano.html">Nascimentos por ano</a> &middot; '
+        '<a href="comparativo_municipios.csv">comparativo_municipios.csv</a> &middot; '
+        '<a href="taxa_por_municipio_ano.csv">taxa_por_municipio_ano.csv</a></p>'
+        + links.to_html(index=False, escape=False, float_format='{:.2f}'.format)
+    )
+    caminho = os.path.join(diretorio, 'index.html')
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(MODELO_HTML.format(titulo=html.escape(f'Baixo Peso ao Nascer – {nome_abrangencia}'),
+                                         plotlyjs=ARQUIVO_PLOTLYJS, corpo=corpo))
+    return caminho
+
+
+# Função para gerar todos os relatórios das UFs em diretorio_saida
+def gerar_relatorios(ufs, diretorio_saida, diretorio_parquet, diretorio_csv, nivel=NIVEL_PADRAO,
+                     trabalhadores=None, png=False):
+    # Exportação estática (PNG) depende do kaleido, dependência opcional
+    if png and importlib.util.find_spec('kaleido') is None:
+        raise ValueError('A exportação em PNG requer o pacote kaleido (pip install kaleido)')
+
+    ufs = tuple(sorted(ufs))
+    nome_abrangencia = descrever_ufs(ufs)
+    cubo = carregar_cubo_relatorio(ufs, diretorio_parquet, diretorio_csv)
+    if cubo is None or cubo['N'].sum() == 0:
+        raise ValueError(f'Nenhum dado encontrado para {nome_abrangencia}')
+
+    geojson, faltando = carregar_geojson_ufs(ufs, nivel)
+    if faltando:
+        print(f'Sem shapefile para {", ".join(faltando)}; esses municípios ficam fora do mapa')
+    nomes = {feature['id']: feature['properties']['NM_MUN'] for feature in geojson['features']}
+
+    # Tabelas (CSV) de todos os municípios das UFs, a partir do mesmo índice do dashboard.
+    # A lista vem da malha (CD_MUN): municípios sem nascimentos ganham linha zerada e
+    # página própria; os do índice entram também, para as UFs sem shapefile.
+    indice = IndiceMunicipios(cubo)
+    municipios = sorted(set(nomes) | {codigo for codigo in indice.municipios() if codigo.startswith(prefixos_ufs(ufs))})
+    df_comparativo = comparar_municipios(indice, municipios)
+    df_comparativo.insert(0, 'Municipio', df_comparativo['CODMUNNASC'].map(lambda codigo: nomes.get(codigo, codigo)))
+    df_comparativo = df_comparativo.sort_values('Municipio', ignore_index=True)
+    df_por_ano = comparar_municipios_por_ano(indice, df_comparativo['CODMUNNASC'])
+    df_por_ano.insert(0, 'Municipio', df_por_ano['CODMUNNASC'].map(lambda codigo: nomes.get(codigo, codigo)))
+    df_combined = nascimentos_por_ano_cubo(cubo)
+    df_combined['Taxa_Baixo_Peso'] = (df_combined['Total_Baixo_Peso'] / df_combined['Total_Nascimentos']) * 100
+
+    diretorio_municipios = os.path.join(diretorio_saida, 'municipios')
+    os.makedirs(diretorio_municipios, exist_ok=True)
+    df_comparativo.to_csv(os.path.join(diretorio_saida, 'comparativo_municipios.csv'), index=False)
+    df_por_ano.to_csv(os.path.join(diretorio_saida, 'taxa_por_municipio_ano.csv'), index=False)
+    df_combined.to_csv(os.path.join(diretorio_saida, 'nascimentos_por_ano.csv'), index=False)
+    with open(os.path.join(diretorio_saida, ARQUIVO_PLOTLYJS), 'w', encoding='utf-8') as arquivo:
+        arquivo.write(plotly.offline.get_plotlyjs())
+    gerados = [gravar_indice(diretorio_saida, nome_abrangencia, calcular_metricas_cubo(cubo), df_comparativo)]
+
+    # Figuras em paralelo: cada tarefa recebe só a fatia de dados que usa
+    grupos_por_ano = dict(tuple(df_por_ano.groupby('CODMUNNASC', sort=False)))
+    with ProcessPoolExecutor(max_workers=trabalhadores) as executor:
+        futuros = [
+            executor.submit(relatorio_mapa, taxa_por_municipio_cubo(cubo), geojson,
+                            f'Taxa de Nascimentos Abaixo do Peso por Município ({nome_abrangencia})', diretorio_saida, png),
+            executor.submit(relatorio_nascimentos_por_ano, df_combined, diretorio_saida, png),
+        ]
+        futuros += [
+            executor.submit(relatorio_municipio, metricas, grupos_por_ano.get(metricas['CODMUNNASC'], df_por_ano.iloc[0:0]),
+                            diretorio_municipios, png)
+            for metricas in df_comparativo.to_dict('records')
+        ]
+        for futuro in as_completed(futuros):
+            gerados.extend(futuro.result())
+    return gerados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera os relatórios estáticos (HTML/PNG/CSV) de baixo peso ao nascer por município.')
+    parser.add_argument('--ufs', nargs='+', default=[UF_PADRAO], help='UFs do relatório (padrão: PB)')
+    parser.add_argument('--saida', default=os.path.join(os.getcwd(), 'relatorios', date.today().isoformat()))
+    parser.add_argument('--parquet', default=os.path.join(os.getcwd(), 'Dados_parquet'))
+    parser.add_argument('--csv', default=os.path.join(os.getcwd(), 'Dados_csv'))
+    parser.add_argument('--nivel', choices=list(TOLERANCIAS), default=NIVEL_PADRAO, help='Nível de detalhe do mapa')
+    parser.add_argument('--trabalhadores', type=int, default=None, help='Processos em paralelo (padrão: nº de CPUs)')
+    parser.add_argument('--png', action='store_true', help='Exporta também PNG (requer o pacote kaleido)')
+    args = parser.parse_args()
+
+    try:
+        gerados = gerar_relatorios([uf.upper() for uf in args.ufs], args.saida, args.parquet, args.csv,
+                                   args.nivel, args.trabalhadores, args.png)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f'{len(gerados)} arquivos gerados em {args.saida}')
@@ -0,0 +1,69 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import instrumentacao
+
+# Carregamentos em segundo plano (threads), para o app desenhar a página antes de
+# os dados e as geometrias estarem prontos. A tarefa guarda o progresso, os avisos
+# e as etapas medidas (instrumentacao.py) para a thread do script exibir; a função
+# executada não deve chamar o Streamlit.
+
+
+# Tarefa em execução em segundo plano
+class Tarefa:
+    def __init__(self, nome):
+        self.nome = nome
+        self.mensagem = 'Na fila...'
+        self.progresso = 0.0
+        self.avisos = []
+        self.registros = []
+        self.registros_exportados = False
+        self.futuro = None
+        self._trava = threading.Lock()
+
+    # Atualiza o progresso (0 a 1) e a mensagem exibida
+    def avancar(self, progresso, mensagem):
+        with self._trava:
+            self.progresso = progresso
+            self.mensagem = mensagem
+
+    # Guarda um aviso ('error' ou 'warning') para a página exibir
+    def avisar(self, nivel, mensagem):
+        with self._trava:
+            self.avisos.append((nivel, mensagem))
+
+    # Etapas medidas ainda não gravadas no log JSON lines: a tarefa fica em cache entre
+    # reruns e sessões, então as etapas dela saem no arquivo uma vez só
+    def registros_para_exportar(self):
+        with self._trava:
+            if self.registros_exportados:
+                return []
+            self.registros_exportados = True
+            return self.registros
+
+    def pronta(self):
+        return self.futuro.done()
+
+    def resultado(self):
+        return self.futuro.result()
+
+
+# Função para criar o executor das tarefas (um por processo, guardado pelo app)
+def criar_executor(trabalhadores=2):
+    return ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='bpn-segundo-plano')
+
+
+# Função para iniciar funcao(tarefa, *args) no executor. As etapas medidas com
+# instrumentacao.etapa dentro dela ficam em tarefa.registros ao terminar.
+def iniciar(executor, nome, funcao, *args):
+    tarefa = Tarefa(nome)
+
+    def executar():
+        instrumentacao.iniciar_execucao(True)
+        try:
+            return funcao(tarefa, *args)
+        finally:
+            tarefa.registros = instrumentacao.registros()
+            tarefa.avancar(1.0, 'Concluído')
+
+    tarefa.futuro = executor.submit(executar)
+    return tarefa
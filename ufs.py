@@ -0,0 +1,48 @@
+# Códigos IBGE das UFs (os dois primeiros dígitos do código de município)
+CODIGOS_UF = {
+    'RO': '11', 'AC': '12', 'AM': '13', 'RR': '14', 'PA': '15', 'AP': '16', 'TO': '17',
+    'MA': '21', 'PI': '22', 'CE': '23', 'RN': '24', 'PB': '25', 'PE': '26', 'AL': '27', 'SE': '28', 'BA': '29',
+    'MG': '31', 'ES': '32', 'RJ': '33', 'SP': '35',
+    'PR': '41', 'SC': '42', 'RS': '43',
+    'MS': '50', 'MT': '51', 'GO': '52', 'DF': '53',
+}
+
+# Nomes das UFs para títulos e textos do dashboard
+NOMES_UF = {
+    'RO': 'Rondônia', 'AC': 'Acre', 'AM': 'Amazonas', 'RR': 'Roraima', 'PA': 'Pará', 'AP': 'Amapá', 'TO': 'Tocantins',
+    'MA': 'Maranhão', 'PI': 'Piauí', 'CE': 'Ceará', 'RN': 'Rio Grande do Norte', 'PB': 'Paraíba',
+    'PE': 'Pernambuco', 'AL': 'Alagoas', 'SE': 'Sergipe', 'BA': 'Bahia',
+    'MG': 'Minas Gerais', 'ES': 'Espírito Santo', 'RJ': 'Rio de Janeiro', 'SP': 'São Paulo',
+    'PR': 'Paraná', 'SC': 'Santa Catarina', 'RS': 'Rio Grande do Sul',
+    'MS': 'Mato Grosso do Sul', 'MT': 'Mato Grosso', 'GO': 'Goiás', 'DF': 'Distrito Federal',
+}
+
+# UFs por região
+REGIOES = {
+    'Norte': ['RO', 'AC', 'AM', 'RR', 'PA', 'AP', 'TO'],
+    'Nordeste': ['MA', 'PI', 'CE', 'RN', 'PB', 'PE', 'AL', 'SE', 'BA'],
+    'Sudeste': ['MG', 'ES', 'RJ', 'SP'],
+    'Sul': ['PR', 'SC', 'RS'],
+    'Centro-Oeste': ['MS', 'MT', 'GO', 'DF'],
+}
+
+# UF padrão do dashboard
+UF_PADRAO = 'PB'
+
+
+# Função para obter os prefixos de código de município das UFs
+def prefixos_ufs(ufs):
+    return tuple(CODIGOS_UF[uf] for uf in ufs)
+
+
+# Função para descrever uma seleção de UFs (ex.: 'Paraíba', 'Nordeste', 'PB, PE')
+def descrever_ufs(ufs):
+    ufs = sorted(ufs)
+    if len(ufs) == 1:
+        return NOMES_UF.get(ufs[0], ufs[0])
+    if ufs == sorted(CODIGOS_UF):
+        return 'Brasil'
+    for regiao, ufs_regiao in REGIOES.items():
+        if ufs == sorted(ufs_regiao):
+            return regiao
+    return ', '.join(ufs)
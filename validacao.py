@@ -0,0 +1,171 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Validação dos registros do SINASC na conversão (ETL.py e armazenamento.py).
+# Cada coluna é classificada em uma passada vetorizada: a regra roda só sobre os
+# valores distintos (poucos: pesos, datas, códigos) e a situação é espalhada de volta
+# pelas linhas com um take. Os valores saem normalizados (ex.: '06' → '6', vírgula
+# decimal no PESO); inválidos, fora da faixa e códigos de ignorado das colunas
+# numéricas viram nulos, então o dashboard não precisa reconverter nem rechecar
+# nada. Os registros com problema continuam no dataset (contam como nascimentos) e
+# vão também, com os valores originais, para o arquivo de quarentena.
+
+# Situação de cada valor (índices das colunas do relatório)
+SITUACOES = ['validos', 'nulos', 'ignorados', 'invalidos', 'fora_da_faixa']
+VALIDO, NULO, IGNORADO, INVALIDO, FORA_DA_FAIXA = range(len(SITUACOES))
+
+# Motivo registrado na quarentena para cada situação que a provoca
+MOTIVOS = {INVALIDO: 'invalido', FORA_DA_FAIXA: 'fora_da_faixa'}
+
+# Diretório (dentro da saída) dos relatórios e das quarentenas; o prefixo '_' faz
+# o pyarrow.dataset ignorá-lo
+DIRETORIO_VALIDACAO = '_validacao'
+
+# Regras por coluna:
+# - 'numero': faixa válida e códigos de ignorado (que viram nulos)
+# - 'codigo': códigos válidos e de ignorado (mantidos, ex.: 9 = ignorado)
+# - 'data': DDMMAAAA (ano igual ao do arquivo, quando conhecido)
+# - 'municipio': código do IBGE com 6 ou 7 dígitos
+REGRAS = {
+    'PESO': {'tipo': 'numero', 'faixa': (1, 7000)},
+    'IDADEMAE': {'tipo': 'numero', 'faixa': (10, 60), 'ignorado': [99]},
+    'APGAR1': {'tipo': 'numero', 'faixa': (0, 10), 'ignorado': [99]},
+    'APGAR5': {'tipo': 'numero', 'faixa': (0, 10), 'ignorado': [99]},
+    'QTDFILVIVO': {'tipo': 'numero', 'faixa': (0, 30), 'ignorado': [99]},
+    'QTDFILMORT': {'tipo': 'numero', 'faixa': (0, 30), 'ignorado': [99]},
+    'DTNASC': {'tipo': 'data'},
+    'CODMUNNASC': {'tipo': 'municipio'},
+    'CODMUNRES': {'tipo': 'municipio'},
+    'LOCNASC': {'tipo': 'codigo', 'validos': [1, 2, 3, 4, 5], 'ignorado': [9]},
+    'ESTCIVMAE': {'tipo': 'codigo', 'validos': [1, 2, 3, 4, 5], 'ignorado': [9]},
+    'ESCMAE': {'tipo': 'codigo', 'validos': [1, 2, 3, 4, 5], 'ignorado': [9]},
+    'GESTACAO': {'tipo': 'codigo', 'validos': [1, 2, 3, 4, 5, 6], 'ignorado': [9]},
+    'GRAVIDEZ': {'tipo': 'codigo', 'validos': [1, 2, 3], 'ignorado': [9]},
+    'PARTO': {'tipo': 'codigo', 'validos': [1, 2], 'ignorado': [9]},
+    'CONSULTAS': {'tipo': 'codigo', 'validos': [1, 2, 3, 4], 'ignorado': [9]},
+    'SEXO': {'tipo': 'codigo', 'validos': [1, 2], 'ignorado': [0, 9]},
+    'RACACOR': {'tipo': 'codigo', 'validos': [1, 2, 3, 4, 5], 'ignorado': [9]},
+}
+
+
+# Função para converter os valores distintos em número (vírgula decimal aceita)
+def _numeros(unicos):
+    return pd.to_numeric(unicos.str.replace(',', '.', regex=False), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+
+# Função para formatar números válidos sem zeros à esquerda nem '.0'
+def _texto_numeros(valores):
+    return np.array(['%g' % valor for valor in valores], dtype=object)
+
+
+# Função para classificar os valores distintos de uma coluna pela regra. Devolve a
+# situação e o valor normalizado (None quando não deve ser mantido) de cada um.
+def classificar_unicos(unicos, regra, ano=None):
+    situacao = np.full(len(unicos), VALIDO, dtype='int8')
+    normalizado = unicos.to_numpy(dtype=object).copy()
+    tipo = regra['tipo']
+
+    if tipo in ('numero', 'codigo'):
+        numeros = _numeros(unicos)
+        invalido = ~np.isfinite(numeros)
+        ignorado = ~invalido & np.isin(numeros, regra.get('ignorado', []))
+        if tipo == 'numero':
+            minimo, maximo = regra['faixa']
+            fora = ~invalido & ~ignorado & ((numeros < minimo) | (numeros > maximo))
+        else:
+            fora = ~invalido & ~ignorado & ~np.isin(numeros, regra['validos'])
+        mantido = ~invalido & ~fora & (tipo == 'codigo' or ~ignorado)
+        normalizado[:] = None
+        normalizado[mantido] = _texto_numeros(numeros[mantido])
+    elif tipo == 'data':
+        digitos = unicos.str.zfill(8)
+        datas = pd.to_datetime(digitos.where(digitos.str.fullmatch(r'\d{8}')), format='%d%m%Y', errors='coerce')
+        invalido = datas.isna().to_numpy()
+        fora = ~invalido & (datas.dt.year.to_numpy() != ano) if ano is not None else np.zeros(len(unicos), dtype=bool)
+        ignorado = np.zeros(len(unicos), dtype=bool)
+        normalizado = np.where(invalido | fora, None, digitos.to_numpy(dtype=object))
+    else:
+        invalido = ~unicos.str.fullmatch(r'\d{6,7}').to_numpy(dtype=bool)
+        fora = ignorado = np.zeros(len(unicos), dtype=bool)
+        normalizado = np.where(invalido, None, normalizado)
+
+    situacao[ignorado] = IGNORADO
+    situacao[invalido] = INVALIDO
+    situacao[fora] = FORA_DA_FAIXA
+    return situacao, normalizado
+
+
+# Função para validar um lote de registros (DataFrame de strings, como lido do DBF
+# ou do CSV). Devolve o lote normalizado, o relatório (colunas x situações) e os
+# registros em quarentena (valores originais + MOTIVOS).
+def validar_lote(df, ano=None):
+    limpo = df.copy()
+    relatorio = {}
+    problemas = {}
+    for coluna, regra in REGRAS.items():
+        if coluna not in df:
+            continue
+        # Espaços e vazios tratados só nos valores distintos
+        codigos, unicos = pd.factorize(df[coluna])
+        unicos = pd.Series(unicos, dtype='string').str.strip()
+        situacao, normalizado = classificar_unicos(unicos.fillna(''), regra, ano)
+        vazios = (unicos.fillna('') == '').to_numpy(dtype=bool)
+        situacao[vazios], normalizado[vazios] = NULO, None
+
+        # Código -1 (nulo) vai para a última posição
+        situacao_linhas = np.append(situacao, NULO)[codigos]
+        limpo[coluna] = pd.Series(np.append(normalizado, None)[codigos], index=df.index, dtype=object)
+        relatorio[coluna] = np.bincount(situacao_linhas, minlength=len(SITUACOES))
+        ruins = situacao_linhas >= INVALIDO
+        if ruins.any():
+            problemas[coluna] = (ruins, situacao_linhas)
+
+    relatorio = pd.DataFrame.from_dict(relatorio, orient='index', columns=SITUACOES).rename_axis('coluna')
+    em_quarentena = np.zeros(len(df), dtype=bool)
+    for ruins, _ in problemas.values():
+        em_quarentena |= ruins
+    quarentena = df[em_quarentena].copy()
+    if len(quarentena):
+        motivos = [
+            pd.Series(np.where(ruins[em_quarentena], f'{coluna}:' + pd.Series(situacao[em_quarentena]).map(MOTIVOS), ''))
+            for coluna, (ruins, situacao) in problemas.items()
+        ]
+        # Concatenação vetorizada das colunas; os separadores das vazias saem depois
+        juntos = motivos[0].str.cat(motivos[1:], sep=';') if len(motivos) > 1 else motivos[0]
+        quarentena['MOTIVOS'] = juntos.str.replace(r';{2,}', ';', regex=True).str.strip(';').to_numpy()
+    return limpo, relatorio, quarentena
+
+
+# Função para somar relatórios parciais (ex.: um por lote)
+def combinar_relatorios(relatorios):
+    relatorios = [relatorio for relatorio in relatorios if relatorio is not None]
+    if not relatorios:
+        return pd.DataFrame(columns=SITUACOES).rename_axis('coluna')
+    return pd.concat(relatorios).groupby(level=0, sort=False).sum()
+
+
+# Função para gravar o relatório e a quarentena de um arquivo de origem em
+# <saida>/_validacao (<nome>_relatorio.csv e <nome>_quarentena.csv). Devolve o
+# resumo guardado no manifesto de ingestão.
+def gravar_validacao(diretorio_saida, nome, relatorio, quarentena):
+    diretorio = os.path.join(diretorio_saida, DIRETORIO_VALIDACAO)
+    os.makedirs(diretorio, exist_ok=True)
+    relatorio.to_csv(os.path.join(diretorio, f'{nome}_relatorio.csv'))
+
+    caminho_quarentena = os.path.join(diretorio, f'{nome}_quarentena.csv')
+    if len(quarentena):
+        quarentena.to_csv(caminho_quarentena, index=False, encoding='utf-8')
+    elif os.path.exists(caminho_quarentena):
+        os.remove(caminho_quarentena)
+    return {
+        'invalidos': int(relatorio['invalidos'].sum()),
+        'fora_da_faixa': int(relatorio['fora_da_faixa'].sum()),
+        'quarentena': int(len(quarentena)),
+    }
+
+
+# Função para exibir o resumo do relatório (só as colunas com algum problema)
+def resumir_relatorio(relatorio):
+    problemas = relatorio[(relatorio[['nulos', 'ignorados', 'invalidos', 'fora_da_faixa']] > 0).any(axis=1)]
+    return problemas.drop(columns='validos').to_string() if len(problemas) else 'sem problemas'